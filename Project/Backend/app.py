@@ -1,34 +1,85 @@
-from flask import Flask, request, send_file, session, redirect, url_for, render_template
-import requests
+from flask import Blueprint, Flask, request, send_file, session, redirect, url_for, render_template, jsonify, Response, stream_with_context, current_app
 import sqlite3
 import random
-import hashlib
 import string
 import json
+import csv
 import os
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from io import BytesIO, StringIO
 from functools import wraps
 from werkzeug.security import generate_password_hash, check_password_hash
-import qrcode
-from PIL import Image
-from pyzbar.pyzbar import decode
 from dotenv import load_dotenv
+import click
+import db
+import history
+import ledger
+import merkle
+import metrics
+import migrations
+import pdfcache
+import search
+import verifycache
+from db import get_db
+from ledger import generate_prescription_hash
+from prescription_parser import PrescriptionParser, parse_prescription_text
 
 # Load environment variables
 load_dotenv()
-OCR_API_KEY = os.getenv('OCR_API_KEY')
 SECRET_KEY = os.getenv('SECRET_KEY', 'fallback-key-for-dev')
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '4'))
+BATCH_MAX_ITEM_BYTES = int(os.getenv('BATCH_MAX_ITEM_BYTES', str(20 * 1024 * 1024)))
+# One /create/bulk request is one chain-writer transaction; keep it short so
+# single /create calls queued behind it are not held for seconds
+BULK_MAX_RECORDS = int(os.getenv('BULK_MAX_RECORDS', '5000'))
+# Import the imaging, PDF and OCR stacks in create_app instead of on first
+# use; worth it under `gunicorn --preload`, where forked workers share them
+PRELOAD_MODULES = os.getenv('PRELOAD_MODULES', '').lower() in ('1', 'true', 'yes')
 
-app = Flask(__name__)
-app.secret_key = SECRET_KEY
-DB_FILE = "prescriptions.db"
+# -------------------
+# Heavy modules are imported on first use, so a worker that only serves
+# /login or /verify by code never loads reportlab, PIL, pyzbar or requests
+# -------------------
+HEAVY_MODULES = ('ocr', 'qr', 'pdfextract', 'reportlab.pdfgen.canvas', 'qrcode')
+
+def preload_modules():
+    for name in HEAVY_MODULES:
+        __import__(name)
+
+def _ocr_cache_count(attr):
+    # Don't import the OCR stack just to report that it hasn't been used
+    ocr = sys.modules.get('ocr')
+    return getattr(ocr.get_ocr().cache, attr) if ocr else 0
+
+views = Blueprint('views', __name__)
+
+metrics.register_counter('rx_pdf_cache_hits_total', 'Prescription PDFs served from the memory cache.',
+                         lambda: pdfcache.get_cache().hits)
+metrics.register_counter('rx_pdf_cache_misses_total', 'Prescription PDFs rendered on a cache miss.',
+                         lambda: pdfcache.get_cache().misses)
+metrics.register_counter('rx_ocr_cache_hits_total', 'OCR results served from the text cache.',
+                         lambda: _ocr_cache_count('hits'))
+metrics.register_counter('rx_ocr_cache_misses_total', 'OCR requests that reached the backend.',
+                         lambda: _ocr_cache_count('misses'))
+metrics.register_counter('rx_verify_cache_hits_total', 'Prescription lookups served from the verification LRU.',
+                         lambda: verifycache.get_cache().hits)
+metrics.register_counter('rx_verify_filter_rejects_total', 'Lookups of never-issued codes answered by the filter.',
+                         lambda: verifycache.get_cache().filter_rejects)
+metrics.register_counter('rx_verify_cache_misses_total', 'Prescription lookups that went to SQLite.',
+                         lambda: verifycache.get_cache().misses)
+metrics.register_counter('rx_verify_filter_false_positives_total', 'Filter passes for codes not in the ledger.',
+                         lambda: verifycache.get_cache().false_positives)
+
+# Roles a user may pick at signup. 'auditor' (ledger-wide history) is granted
+# explicitly with `flask --app app grant-role <username> auditor`
+SIGNUP_ROLES = ('issuer', 'verifier')
+AUDIT_ROLE = 'auditor'
 
 # -------------------
 # Make username + role available in ALL templates
 # -------------------
-@app.context_processor
 def inject_user():
     return {
         'username': session.get('username'),
@@ -39,56 +90,37 @@ def inject_user():
 # Helper Functions
 # -------------------
 def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    """Apply pending schema migrations; safe to run on every start."""
+    applied = migrations.migrate()
+    if applied:
+        print("Applied migrations:", ', '.join(applied))
 
-    c.execute('''DROP TABLE IF EXISTS prescriptions;''')
-    
-    # Create new table with hash column
-    c.execute('''
-        CREATE TABLE prescriptions (
-            code TEXT PRIMARY KEY,
-            doctor_name TEXT,
-            doctor_id TEXT,
-            patient_name TEXT,
-            date TEXT,
-            medications TEXT,
-            hash TEXT,
-            previous_hash TEXT
-        )
-    ''')
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE,
-        password TEXT,
-        role TEXT,
-        name TEXT,
-        license_id TEXT,
-        organization TEXT
-    )''')
-
-    conn.commit()
-    conn.close()
+def reset_db():
+    """Drop the ledger and start from an empty schema (benchmarks, local dev)."""
+    migrations.reset()
+    verifycache.get_cache().reset()
+    ledger.get_writer().forget_head()
 
 def generate_code(length=8):
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
 
-def get_previous_hash():
-    with sqlite3.connect(DB_FILE) as conn:
-        c = conn.cursor()
-        
-        # Backup existing prescriptions if table exists
-        try:
-            c.execute("SELECT hash FROM prescriptions ORDER BY id DESC LIMIT 1;")
-            result = c.fetchone()
+def allocate_codes(count, length=8):
+    """`count` distinct codes that are not in the ledger yet."""
+    conn = get_db()
+    codes = set()
+    while len(codes) < count:
+        candidates = list({generate_code(length) for _ in range(count - len(codes))} - codes)
+        # Check against the ledger in chunks that fit SQLite's parameter limit
+        for i in range(0, len(candidates), 500):
+            chunk = candidates[i:i + 500]
+            with metrics.stage('sqlite'):
+                taken = conn.execute(f"SELECT code FROM prescriptions WHERE code IN ({','.join('?' * len(chunk))})",
+                                     chunk).fetchall()
+            codes.update(set(chunk) - {row[0] for row in taken})
+    return list(codes)
 
-            if result:
-                return result[0]
-            else:
-                return ''
-        except Exception as e:
-            print(f"CRITICAL ERROR: An unexpected error occurred: {e}")
-            return ''
+def get_previous_hash():
+    return ledger.get_writer().head()
 
 def add_prescription(code, previous_code, doctor_name, doctor_id, patient_name, date, medications):
     # Create prescription data for hashing
@@ -103,71 +135,69 @@ def add_prescription(code, previous_code, doctor_name, doctor_id, patient_name,
     
     # Generate hash
     prescription_hash = generate_prescription_hash(prescription_data)
-    previous_hash = get_previous_hash()
-    
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    meds_str = ','.join(medications)
-    c.execute('''
-        INSERT INTO prescriptions (code, doctor_name, doctor_id, patient_name, date, medications, hash, previous_hash)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (code, doctor_name, doctor_id, patient_name, date, meds_str, prescription_hash, previous_hash))
-
-    conn.commit()
-    conn.close()
 
-def get_prescription(code):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT * FROM prescriptions WHERE code=?", (code,))
-    result = c.fetchone()
-    conn.close()
+    # The chain writer links previous_hash and commits; wait for our row
+    meds_str = ','.join(medications)
+    future = ledger.get_writer().submit(
+        (code, doctor_name, doctor_id, patient_name, date, meds_str, prescription_hash))
+    with metrics.stage('ledger_write'):
+        result = future.result(timeout=30)
+    verifycache.get_cache().add_codes([code])
+    if pdfcache.PDF_PRERENDER:
+        _prerender_pool.submit(prerender_pdf, code)
     return result
 
-def generate_prescription_hash(prescription_data):
-    data_string = json.dumps(prescription_data, sort_keys=True)
+def add_prescriptions_bulk(records, attempts=3):
+    """Issue many prescriptions in one transaction; returns their codes in input order.
+
+    Each record is a dict with doctor_name, doctor_id, patient_name, date and
+    a medications list. Codes come from allocate_codes; if a concurrent
+    /create grabs one first the whole batch is retried with fresh codes.
+    """
+    for attempt in range(attempts):
+        codes = allocate_codes(len(records))
+        rows = []
+        for code, record in zip(codes, records):
+            prescription_data = dict(record, code=code)
+            rows.append((code, record['doctor_name'], record['doctor_id'], record['patient_name'], record['date'],
+                         ','.join(record['medications']), generate_prescription_hash(prescription_data)))
+        try:
+            with metrics.stage('ledger_write'):
+                ledger.get_writer().submit_many(rows).result(timeout=600)
+            verifycache.get_cache().add_codes(codes)
+            return codes
+        except sqlite3.IntegrityError:
+            if attempt == attempts - 1:
+                raise
+
+def load_prescription(code):
+    """Ledger row for code with its medications (a tuple) appended as db_entry[8].
+
+    The medications come from the hashed, audited column, never from
+    medication_lines, so what /verify and the PDF show is what was hashed.
+    """
+    with metrics.stage('sqlite'):
+        row = get_db().execute(db.SQL_GET_PRESCRIPTION, (code,)).fetchone()
+    if row is None:
+        return None
+    return row + (tuple(line[2] for line in ledger.medication_lines(code, row[5] or '')),)
 
-    hash_object = hashlib.sha256(data_string.encode())
-    prescription_hash = hash_object.hexdigest()
+def load_inclusion_proof(code):
+    with metrics.stage('merkle_proof'):
+        return merkle.inclusion_proof(get_db(), code)
 
-    return prescription_hash
+def get_prescription(code):
+    # Unknown codes are turned away by the issued-code filter before SQLite
+    return verifycache.get_cache().get_row(code, get_db, load_prescription)
 
-def parse_prescription_text(text):
-    """Simple heuristic parser."""
-    if not text:
-        return None
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    data = {'code': None, 'doctor_name': None, 'doctor_id': None,
-            'patient_name': None, 'date': None, 'medications': []}
-    for i, line in enumerate(lines):
-        low = line.lower()
-        if 'code' in low:
-            data['code'] = line.split(':')[-1].strip()
-        elif 'doctor name' in low:
-            data['doctor_name'] = line.split(':')[-1].strip()
-        elif 'doctor id' in low or 'license' in low:
-            data['doctor_id'] = line.split(':')[-1].strip()
-        elif 'patient name' in low:
-            data['patient_name'] = line.split(':')[-1].strip()
-        elif 'date' in low:
-            data['date'] = line.split(':')[-1].strip()
-        elif 'medications' in low or 'medicines' in low:
-            meds = line.split(':')[-1].strip()
-            if meds:
-                data['medications'] = [m.strip() for m in meds.split(',')]
-                data['medications'] = data['medications'][2:]
-            else:
-                j = i + 1
-                while j < len(lines) and not any(k in lines[j].lower() for k in ['doctor','patient','code','date']):
-                    data['medications'].append(lines[j].strip())
-                    j += 1
-    return data
+def get_inclusion_proof(code):
+    return verifycache.get_cache().get_proof(code, get_db, load_inclusion_proof)
 
 def login_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         if 'user_id' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('views.login'))
         return f(*args, **kwargs)
     return decorated
 
@@ -184,59 +214,56 @@ def role_required(role):
 # -------------------
 # Routes
 # -------------------
-@app.route('/')
+@views.route('/')
 def home():
     return render_template('home.html')
 
-@app.route('/signup', methods=['GET','POST'])
+@views.route('/signup', methods=['GET','POST'])
 def signup():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         role = request.form['role']
+        if role not in SIGNUP_ROLES:
+            return "Invalid role"
         name = request.form['name']
         license_id = request.form['license_id']
         organization = request.form['organization']
         hashed_pw = generate_password_hash(password)
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
+        conn = get_db()
         try:
-            c.execute('''INSERT INTO users (username, password, role, name, license_id, organization)
-                         VALUES (?, ?, ?, ?, ?, ?)''',
-                      (username, hashed_pw, role, name, license_id, organization))
-            conn.commit()
+            with conn:
+                conn.execute(db.SQL_INSERT_USER,
+                             (username, hashed_pw, role, name, license_id, organization))
         except sqlite3.IntegrityError:
             return "Username already exists"
-        conn.close()
         message = "Signup successful! You can now login."
-        return render_template('message.html', title='Signup Successful', message=message, link_url=url_for('login'), link_text='Login')
+        return render_template('message.html', title='Signup Successful', message=message, link_url=url_for('views.login'), link_text='Login')
     return render_template('signup.html')
 
-@app.route('/login', methods=['GET','POST'])
+@views.route('/login', methods=['GET','POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT id, password, role FROM users WHERE username=?", (username,))
-        user = c.fetchone()
-        conn.close()
+        with metrics.stage('sqlite'):
+            user = get_db().execute(db.SQL_GET_USER, (username,)).fetchone()
         if user and check_password_hash(user[1], password):
             session['user_id'] = user[0]
             session['role'] = user[2]
+            session['license_id'] = user[3]
             session['username'] = username
-            return redirect(url_for('home'))
+            return redirect(url_for('views.home'))
         else:
-            return render_template('message.html', title='Login Failed', message="Invalid username or password.", link_url=url_for('login'), link_text='Try Again')
+            return render_template('message.html', title='Login Failed', message="Invalid username or password.", link_url=url_for('views.login'), link_text='Try Again')
     return render_template('login.html')
 
-@app.route('/logout')
+@views.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('home'))
+    return redirect(url_for('views.home'))
 
-@app.route('/create', methods=['GET','POST'])
+@views.route('/create', methods=['GET','POST'])
 @login_required
 @role_required('issuer')
 def create():
@@ -246,163 +273,394 @@ def create():
         patient_name = request.form['patient_name']
         date = request.form['date']
         medications = request.form['medications'].split(',')
-        code = generate_code()
-        previous_code = get_previous_hash()
-        add_prescription(code, previous_code, doctor_name, doctor_id, patient_name, date, medications)
+        # Codes are random, so on the rare collision just draw another one
+        for attempt in range(5):
+            code = generate_code()
+            previous_code = get_previous_hash()
+            try:
+                add_prescription(code, previous_code, doctor_name, doctor_id, patient_name, date, medications)
+                break
+            except sqlite3.IntegrityError:
+                if attempt == 4:
+                    raise
         return render_template('created.html', code=code)
     return render_template('create.html')
 
+BULK_FIELDS = ('doctor_name', 'doctor_id', 'patient_name', 'date', 'medications')
+
+def parse_bulk_records(text, is_csv):
+    """Parse CSV (with a header row) or JSON lines into records for add_prescriptions_bulk."""
+    lines = csv.DictReader(StringIO(text)) if is_csv else (json.loads(l) for l in text.splitlines() if l.strip())
+    records = []
+    for number, item in enumerate(lines, start=1):
+        if number > BULK_MAX_RECORDS:
+            raise ValueError(f"at most {BULK_MAX_RECORDS} records per request")
+        if not isinstance(item, dict):
+            raise ValueError(f"record {number} must be an object")
+        missing = [f for f in BULK_FIELDS if not item.get(f)]
+        if missing:
+            raise ValueError(f"record {number} is missing {', '.join(missing)}")
+        medications = item['medications']
+        if isinstance(medications, str):
+            medications = medications.split(',')
+        elif not isinstance(medications, list):
+            raise ValueError(f"record {number}: medications must be a list or a comma-separated string")
+        medications = [str(m) for m in medications]
+        # The ledger stores medications comma-joined, so an item containing a
+        # comma would be hashed as one line but read back as several
+        if any(',' in m for m in medications):
+            raise ValueError(f"record {number}: medication items must not contain ','")
+        record = {f: str(item[f]) for f in BULK_FIELDS[:-1]}
+        record['medications'] = medications
+        records.append(record)
+    return records
+
+@views.route('/create/bulk', methods=['POST'])
+@login_required
+@role_required('issuer')
+def create_bulk():
+    file = request.files.get('file')
+    if file and file.filename != '':
+        text = file.read().decode('utf-8-sig')
+        is_csv = file.filename.lower().endswith('.csv')
+    else:
+        text = request.get_data(as_text=True)
+        is_csv = request.mimetype == 'text/csv'
+    try:
+        records = parse_bulk_records(text, is_csv)
+    except (ValueError, KeyError) as e:
+        return jsonify({'error': str(e)}), 400
+    if not records:
+        return jsonify({'error': 'no records found'}), 400
+    codes = add_prescriptions_bulk(records)
+    return jsonify({'count': len(codes), 'codes': codes})
+
+# -------------------
+# Verification (shared by /verify and /verify/batch)
+# -------------------
+def parse_uploaded_file(filename, file_bytes, code=''):
+    """Decode an uploaded PDF or image. Returns (code, qr_found, db_entry, parsed_from_file)."""
+    parsed_from_file = None
+    qr_found = False
+    db_entry = None
+    fname = filename.lower()
+    try:
+        # Import inside each branch and the try: a PDF never needs pyzbar or
+        # the OCR client, and a host missing one gets a parse error, not a 500
+        if fname.endswith('.pdf'):
+            import pdfextract
+            with metrics.stage('pdf_extract'):
+                parsed_from_file = pdfextract.parse_pdf(file_bytes, PrescriptionParser())
+        else:
+            import ocr
+            import qr
+            from PIL import Image
+            img = Image.open(BytesIO(file_bytes))
+            ocr_future = None
+            for stage, qr_codes in qr.qr_passes(img):
+                if qr_codes:
+                    qr_found = True
+                    # set code from QR if present, but do NOT bail out if DB lookup fails
+                    code = qr_codes[0]
+                    db_entry = get_prescription(code)
+                    break
+                if ocr_future is None:
+                    # Cheap pass came up empty: start OCR while slower passes run.
+                    # If a later pass finds the QR code the request is cancelled
+                    # if still queued, but one the backend has already started
+                    # runs to completion (and is cached); we accept that paid
+                    # call to keep OCR off the critical path of QR-less images.
+                    ocr_future = ocr.get_ocr().submit(file_bytes)
+            # A QR code that matches the ledger is conclusive, so OCR is skipped
+            if db_entry:
+                if ocr_future is not None:
+                    ocr_future.cancel()
+            else:
+                if ocr_future is None:
+                    ocr_future = ocr.get_ocr().submit(file_bytes)
+                with metrics.stage('ocr'):
+                    extracted_text = ocr.get_ocr().wait(ocr_future)
+                if extracted_text:
+                    parsed_from_file = parse_prescription_text(extracted_text)
+    except Exception as e:
+        print("File parse error:", e)
+    return code, qr_found, db_entry, parsed_from_file
+
+def run_verification(code='', filename='', file_bytes=None, with_proof=True):
+    """Verify a code and/or uploaded file against the ledger.
+
+    Returns the fields for verify_result.html plus 'found' (whether a ledger
+    entry matched), or None when nothing usable could be read. The Merkle
+    inclusion proof is only built when with_proof is set.
+    """
+    parsed_from_file = None
+    qr_found = False
+    db_entry = None
+
+    # Parse uploaded file if exists
+    if file_bytes:
+        code, qr_found, db_entry, parsed_from_file = parse_uploaded_file(filename, file_bytes, code)
+
+    # Try database verification - improved logic:
+    # If we have a code (from form or QR), try lookup first
+    if code and not db_entry:
+        db_entry = get_prescription(code)
+        # if code present but not found in DB, DON'T immediately return;
+        # we'll attempt matching using parsed_from_file fields below
+    # If not found by code lookup, but we have parsed text, try match by fields
+    if not db_entry and parsed_from_file:
+        # Exact match on doctor_name + patient_name + date (idx_prescriptions_match)
+        with metrics.stage('sqlite'):
+            match = get_db().execute(db.SQL_MATCH_FIELDS, (
+                parsed_from_file.get('doctor_name', ''),
+                parsed_from_file.get('patient_name', ''),
+                parsed_from_file.get('date', '')
+            )).fetchone()
+        if match:
+            db_entry = get_prescription(match[0])
+
+    # If still not found, but code exists (maybe OCR had code text different) try fallback:
+    # If parsed_from_file has a code text, try that too
+    if not db_entry and parsed_from_file and parsed_from_file.get('code'):
+        db_entry = get_prescription(parsed_from_file.get('code'))
+
+    # Last resort: OCR rarely reads names exactly, so rank near matches
+    if not db_entry and parsed_from_file:
+        with metrics.stage('search'):
+            candidates = search.find_candidates(get_db(), parsed_from_file)
+        if candidates:
+            db_entry = get_prescription(candidates[0][1])
+
+    # If we have a DB entry now, determine whether to mark verified:
+    if db_entry:
+        db_data = {
+            'code': db_entry[0],
+            'doctor_name': db_entry[1],
+            'doctor_id': db_entry[2],
+            'patient_name': db_entry[3],
+            'date': db_entry[4],
+            'medications': list(db_entry[8])
+        }
+
+        # If QR was found and matches DB code -> strong verify
+        if qr_found and code and code == db_data['code']:
+            is_verified = True
+        else:
+            # Otherwise compare parsed fields (if any) against db fields
+            matches = 0
+            if parsed_from_file:
+                if parsed_from_file.get('code') and parsed_from_file.get('code') == db_data['code']:
+                    matches += 1
+                if parsed_from_file.get('doctor_name') and parsed_from_file.get('doctor_name') == db_data['doctor_name']:
+                    matches += 1
+                if parsed_from_file.get('patient_name') and parsed_from_file.get('patient_name') == db_data['patient_name']:
+                    matches += 1
+                if parsed_from_file.get('date') and parsed_from_file.get('date') == db_data['date']:
+                    matches += 1
+            # Also count if the manually-entered form code matched DB
+            if code and code == db_data['code']:
+                # if this matched earlier, matches++ (but don't double-count if parsed_from_file had same code)
+                if not (parsed_from_file and parsed_from_file.get('code') == code):
+                    matches += 1
+
+            # Decide threshold: code match OR at least 2 other fields matching
+            is_verified = bool((code and code == db_data['code']) or (matches >= 2))
+
+        db_data.update(
+            found=True,
+            is_verified=is_verified,
+            prescription_hash=db_entry[6]
+        )
+        if with_proof:
+            db_data['proof'] = get_inclusion_proof(db_data['code'])
+        return db_data
+
+    # No match found: show parsed fields if any (to allow manual review)
+    if parsed_from_file:
+        return {
+            'found': False,
+            'code': parsed_from_file.get('code',''),
+            'doctor_name': parsed_from_file.get('doctor_name',''),
+            'doctor_id': parsed_from_file.get('doctor_id',''),
+            'patient_name': parsed_from_file.get('patient_name',''),
+            'date': parsed_from_file.get('date',''),
+            'medications': parsed_from_file.get('medications',[]),
+            'is_verified': False
+        }
+
+    # Completely empty/no data
+    return None
+
 # -------------------
 # VERIFY ROUTE (FIXED)
 # -------------------
-@app.route('/verify', methods=['GET','POST'])
+@views.route('/verify', methods=['GET','POST'])
 @login_required
 @role_required('verifier')
 def verify():
     if request.method == 'POST':
         code = request.form.get('code', '').strip()
         file = request.files.get('prescription')
-        parsed_from_file = None
-        qr_found = False
-
-        # Parse uploaded file if exists
+        filename, file_bytes = '', None
         if file and file.filename != '':
             file.seek(0)
-            fname = file.filename.lower()
-            try:
-                if fname.endswith('.pdf'):
-                    from PyPDF2 import PdfReader
-                    reader = PdfReader(file)
-                    extracted_text = ''
-                    for page in reader.pages:
-                        extracted_text += (page.extract_text() or '') + '\n'
-                    parsed_from_file = parse_prescription_text(extracted_text)
-                else:
-                    img = Image.open(file)
-                    qr_data = decode(img)
-                    if qr_data:
-                        qr_found = True
-                        # set code from QR if present, but do NOT bail out if DB lookup fails
-                        code = qr_data[0].data.decode('utf-8')
-                    file.seek(0)
-                    file_bytes = file.read()
-                    # call OCR only if we didn't already get enough fields or to cross-check
-                    try:
-                        response = requests.post(
-                            "https://api.ocr.space/parse/image",
-                            files={"filename": ("image.png", file_bytes)},
-                            data={"apikey": OCR_API_KEY, "language": "eng"}
-                        )
-                        result = response.json()
-                        parsed_results = result.get("ParsedResults")
-                        if parsed_results:
-                            extracted_text = parsed_results[0].get("ParsedText", "")
-                            parsed_from_file = parse_prescription_text(extracted_text)
-                    except Exception as e:
-                        print("OCR request failed:", e)
-            except Exception as e:
-                print("File parse error:", e)
-
-        # Try database verification - improved logic:
-        db_entry = None
-        # If we have a code (from form or QR), try lookup first
-        if code:
-            db_entry = get_prescription(code)
-            # if code present but not found in DB, DON'T immediately return;
-            # we'll attempt matching using parsed_from_file fields below
-        # If not found by code lookup, but we have parsed text, try match by fields
-        if not db_entry and parsed_from_file:
-            # Use exact match on doctor_name + patient_name + date (simple approach)
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            query = "SELECT * FROM prescriptions WHERE doctor_name=? AND patient_name=? AND date=?"
-            c.execute(query, (
-                parsed_from_file.get('doctor_name', ''),
-                parsed_from_file.get('patient_name', ''),
-                parsed_from_file.get('date', '')
-            ))
-            db_entry = c.fetchone()
-            conn.close()
-
-        # If still not found, but code exists (maybe OCR had code text different) try fallback:
-        # If parsed_from_file has a code text, try that too
-        if not db_entry and parsed_from_file and parsed_from_file.get('code'):
-            db_entry = get_prescription(parsed_from_file.get('code'))
+            filename, file_bytes = file.filename, file.read()
 
-        # If we have a DB entry now, determine whether to mark verified:
-        if db_entry:
-            db_data = {
-                'code': db_entry[0],
-                'doctor_name': db_entry[1],
-                'doctor_id': db_entry[2],
-                'patient_name': db_entry[3],
-                'date': db_entry[4],
-                'medications': db_entry[5].split(',')
-            }
-
-            # If QR was found and matches DB code -> strong verify
-            if qr_found and code and code == db_data['code']:
-                is_verified = True
-            else:
-                # Otherwise compare parsed fields (if any) against db fields
-                matches = 0
-                if parsed_from_file:
-                    if parsed_from_file.get('code') and parsed_from_file.get('code') == db_data['code']:
-                        matches += 1
-                    if parsed_from_file.get('doctor_name') and parsed_from_file.get('doctor_name') == db_data['doctor_name']:
-                        matches += 1
-                    if parsed_from_file.get('patient_name') and parsed_from_file.get('patient_name') == db_data['patient_name']:
-                        matches += 1
-                    if parsed_from_file.get('date') and parsed_from_file.get('date') == db_data['date']:
-                        matches += 1
-                # Also count if the manually-entered form code matched DB
-                if code and code == db_data['code']:
-                    # if this matched earlier, matches++ (but don't double-count if parsed_from_file had same code)
-                    if not (parsed_from_file and parsed_from_file.get('code') == code):
-                        matches += 1
-
-                # Decide threshold: code match OR at least 2 other fields matching
-                is_verified = (code and code == db_data['code']) or (matches >= 2)
-
-            return render_template('verify_result.html',
-                code=db_data['code'],
-                doctor_name=db_data['doctor_name'],
-                doctor_id=db_data['doctor_id'],
-                patient_name=db_data['patient_name'],
-                date=db_data['date'],
-                medications=db_data['medications'],
-                is_verified=is_verified
-            )
-
-        # No match found: show parsed fields if any (to allow manual review)
-        if parsed_from_file:
-            return render_template('verify_result.html',
-                code=parsed_from_file.get('code',''),
-                doctor_name=parsed_from_file.get('doctor_name',''),
-                doctor_id=parsed_from_file.get('doctor_id',''),
-                patient_name=parsed_from_file.get('patient_name',''),
-                date=parsed_from_file.get('date',''),
-                medications=parsed_from_file.get('medications',[]),
-                is_verified=False
-            )
-
-        # Completely empty/no data
+        result = run_verification(code, filename, file_bytes)
+        if result:
+            return render_template('verify_result.html', **result)
         return render_template('verify.html', error="Invalid file or no prescription data could be found.")
     return render_template('verify.html')
 
 # -------------------
-# Download PDF with QR
+# Batch verification (NDJSON stream)
 # -------------------
-@app.route('/download/<code>')
+_batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch-verify')
+
+def read_batch_request():
+    """Validate the batch request before anything is streamed.
+
+    Accepts a JSON body {"codes": [...]}, a `codes` form field (one per line
+    or comma separated) and any number of `files`. Zip files are opened here,
+    so one that is not a readable archive is refused up front. Returns
+    (codes, files) with each file as (filename, stream, ZipFile or None);
+    raises ValueError for a malformed request.
+    """
+    if request.is_json:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            raise ValueError('expected a JSON object like {"codes": [...]}')
+        codes = body.get('codes', [])
+        if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+            raise ValueError('"codes" must be a list of strings')
+    else:
+        codes = request.form.get('codes', '').replace(',', '\n').splitlines()
+    files = []
+    try:
+        for file in request.files.getlist('files'):
+            if not file or file.filename == '':
+                continue
+            # The request closes its uploads when the view returns, before the
+            # response is streamed; take the stream so iter_batch_items owns it
+            stream, file.stream = file.stream, BytesIO()
+            files.append((file.filename, stream, None))
+            if file.filename.lower().endswith('.zip'):
+                try:
+                    files[-1] = (file.filename, stream, zipfile.ZipFile(stream))
+                except zipfile.BadZipFile as e:
+                    raise ValueError(f"{file.filename} is not a readable zip archive: {e}")
+    except ValueError:
+        close_batch_files(files)
+        raise
+    return codes, files
+
+def close_batch_files(files):
+    for _, stream, _ in files:
+        stream.close()
+
+def iter_batch_items(codes, files):
+    """Yield (name, code, filename, file_bytes, error) lazily, one archive member at a time.
+
+    Closes the uploaded files when done, or when the response is cut short.
+    """
+    try:
+        for code in codes:
+            code = code.strip()
+            if code:
+                yield code, code, '', None, None
+        for filename, stream, archive in files:
+            if archive is None:
+                yield filename, '', filename, stream.read(BATCH_MAX_ITEM_BYTES + 1), None
+                continue
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                if info.file_size > BATCH_MAX_ITEM_BYTES:
+                    yield info.filename, '', info.filename, None, 'empty or oversized file'
+                    continue
+                try:
+                    member = archive.read(info)
+                except Exception as e:
+                    # Corrupt or encrypted member: report it and carry on with the rest
+                    yield info.filename, '', info.filename, None, f"unreadable archive member: {e}"
+                    continue
+                yield info.filename, '', info.filename, member, None
+    finally:
+        close_batch_files(files)
+
+def verify_batch_item(flask_app, index, name, code, filename, file_bytes, error):
+    item = {'index': index, 'item': name}
+    if error:
+        item.update(status='error', error=error)
+        return item
+    if file_bytes is not None and not (0 < len(file_bytes) <= BATCH_MAX_ITEM_BYTES):
+        item.update(status='error', error='empty or oversized file')
+        return item
+    try:
+        with flask_app.app_context():
+            result = run_verification(code, filename, file_bytes, with_proof=False)
+    except Exception as e:
+        print("Batch verification failed:", e)
+        item.update(status='error', error=str(e))
+        return item
+    if not result:
+        item['status'] = 'not_found' if file_bytes is None else 'unreadable'
+    else:
+        item.update(result)
+        item['status'] = 'verified' if result['is_verified'] else ('unverified' if result['found'] else 'not_found')
+    return item
+
+@views.route('/verify/batch', methods=['POST'])
 @login_required
-def download_prescription(code):
-    db_entry = get_prescription(code)
-    if not db_entry:
-        return f"Prescription code {code} NOT found."
-    doctor_name, doctor_id, patient_name, date, medications = db_entry[1], db_entry[2], db_entry[3], db_entry[4], db_entry[5].split(',')
+@role_required('verifier')
+def verify_batch():
+    # Keep at most a couple of items per worker in memory at once
+    window = 2 * BATCH_WORKERS
+    flask_app = current_app._get_current_object()
+    # Once streaming starts the status is 200, so refuse bad input now
+    try:
+        codes, files = read_batch_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        pending = set()
+        for index, item in enumerate(iter_batch_items(codes, files)):
+            pending.add(_batch_pool.submit(verify_batch_item, flask_app, index, *item))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield json.dumps(future.result()) + '\n'
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield json.dumps(future.result()) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# -------------------
+# Download PDF with QR
+# -------------------
+def prescription_qr_image(code):
+    """The QR code printed on a prescription PDF, as an RGB PIL image."""
+    import qrcode
+
+    qr_code = qrcode.QRCode(box_size=2, border=1)
+    qr_code.add_data(f"{code}")
+    qr_code.make(fit=True)
+    return qr_code.make_image(fill_color="black", back_color="white").convert("RGB")
+
+def render_prescription_pdf(db_entry):
+    import pdfextract
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    code, doctor_name, doctor_id, patient_name, date, medications = db_entry[0], db_entry[1], db_entry[2], db_entry[3], db_entry[4], db_entry[8]
 
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=letter)
+    c.setTitle(f"Prescription {code}")
+    c.setSubject(f"{pdfextract.SUBJECT_PREFIX}{code}")
     width, height = letter
 
     y = height - 50
@@ -429,20 +687,176 @@ def download_prescription(code):
         c.drawString(60, y, f"- {med.strip()}")
         y -= 20
 
-    qr_data = f"{code}"
-    qr = qrcode.QRCode(box_size=2, border=1)
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
-    c.drawInlineImage(img, 400, height - 150)
+    c.drawInlineImage(prescription_qr_image(code), 400, height - 150)
+
+    # Only fixed facts go on the page, so the bytes can be cached and tagged
+    # by the row hash. The inclusion proof changes as the ledger grows; the
+    # printout points to where the current one can be fetched.
+    y -= 20
+    c.setFont("Helvetica-Bold", 8)
+    c.drawString(50, y, f"Ledger entry (proof of inclusion: /ledger/proof/{code})")
+    c.setFont("Courier", 6)
+    y -= 10
+    c.drawString(50, y, f"hash {db_entry[6]}")
 
     c.save()
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name=f"Prescription_{code}.pdf", mimetype='application/pdf')
+    return buffer.getvalue()
+
+# Bump when the page layout changes, so cached PDFs and ETags from the old layout are not reused
+PDF_LAYOUT = 2
+
+def pdf_cache_key(db_entry):
+    return f"{db_entry[6]}-{PDF_LAYOUT}"
+
+def get_prescription_pdf(db_entry):
+    """(pdf_bytes, rendered_at) for a ledger row, rendering only on a cache miss."""
+    cache = pdfcache.get_cache()
+    key = pdf_cache_key(db_entry)
+    with metrics.stage('pdf_cache'):
+        item = cache.get(key)
+    if item is None:
+        with metrics.stage('pdf_render'):
+            pdf_bytes = render_prescription_pdf(db_entry)
+        item = cache.put(key, pdf_bytes)
+    return item
+
+_prerender_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-prerender')
+
+def prerender_pdf(code):
+    # Runs on the pre-render thread, which keeps its own connection (db.get_db)
+    try:
+        db_entry = get_prescription(code)
+        if db_entry:
+            get_prescription_pdf(db_entry)
+    except Exception as e:
+        print("PDF pre-render failed:", e)
+
+@views.route('/download/<code>')
+@login_required
+def download_prescription(code):
+    db_entry = get_prescription(code)
+    if not db_entry:
+        return f"Prescription code {code} NOT found."
+    pdf_bytes, rendered_at = get_prescription_pdf(db_entry)
+    # The bytes depend only on the row and the layout, so the cache key is a
+    # strong ETag and repeat downloads get a 304
+    return send_file(BytesIO(pdf_bytes), as_attachment=True, download_name=f"Prescription_{code}.pdf",
+                     mimetype='application/pdf', etag=pdf_cache_key(db_entry), last_modified=rendered_at,
+                     conditional=True)
+
+# -------------------
+# Prescription history (JSON, keyset pagination)
+# -------------------
+def history_page(column=None, value=None):
+    try:
+        limit = int(request.args.get('limit', history.DEFAULT_LIMIT))
+        result = history.page(get_db(), column, value,
+                              date_from=request.args.get('from'), date_to=request.args.get('to'),
+                              cursor=request.args.get('cursor'), limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+def history_allowed(doctor_id=None):
+    """Auditors may read any history; issuers only the records issued under their license ID."""
+    if session.get('role') == AUDIT_ROLE:
+        return True
+    return (doctor_id is not None and session.get('role') == 'issuer'
+            and session.get('license_id') == doctor_id)
+
+HISTORY_DENIED = {'error': 'Access denied for your role.'}
+
+@views.route('/history/doctor/<doctor_id>')
+@login_required
+def history_by_doctor(doctor_id):
+    if not history_allowed(doctor_id):
+        return jsonify(HISTORY_DENIED), 403
+    return history_page('doctor_id', doctor_id)
+
+@views.route('/history/patient/<patient_name>')
+@login_required
+def history_by_patient(patient_name):
+    if not history_allowed():
+        return jsonify(HISTORY_DENIED), 403
+    return history_page('patient_name', patient_name)
+
+@views.route('/history')
+@login_required
+def history_by_date():
+    if not history_allowed():
+        return jsonify(HISTORY_DENIED), 403
+    return history_page()
+
+# -------------------
+# Ledger Merkle root and inclusion proofs
+# -------------------
+@views.route('/ledger/root')
+def ledger_root():
+    root_hash, size = merkle.root(get_db())
+    return jsonify({'root': root_hash, 'tree_size': size})
+
+@views.route('/ledger/proof/<code>')
+@login_required
+def ledger_proof(code):
+    db_entry = get_prescription(code)
+    proof = get_inclusion_proof(code) if db_entry else None
+    if not proof:
+        return jsonify({'error': f"Prescription code {code} NOT found."}), 404
+    proof = dict(proof, prescription_hash=db_entry[6])
+    return jsonify(proof)
+
+# -------------------
+# Application factory
+# -------------------
+@click.command('grant-role')
+@click.argument('username')
+@click.argument('role', type=click.Choice(SIGNUP_ROLES + (AUDIT_ROLE,)))
+def grant_role(username, role):
+    """Set a user's role, e.g. to grant ledger-wide history access (auditor)."""
+    conn = db.connect()
+    try:
+        with conn:
+            updated = conn.execute(db.SQL_SET_USER_ROLE, (role, username)).rowcount
+    finally:
+        conn.close()
+    print(f"{username} is now {role}." if updated else f"No user named {username}.")
+
+def create_app(config=None):
+    """Build the Flask app: config, extensions, views and schema migrations.
+
+    `config` may set DB_FILE (default: the DB_FILE env var); the database is
+    switched before migrations run or the code filter starts loading. Heavy
+    modules are left to load on first use unless PRELOAD_MODULES is set.
+    """
+    flask_app = Flask(__name__)
+    flask_app.secret_key = SECRET_KEY
+    if config:
+        flask_app.config.update(config)
+    db.init_app(flask_app)
+    metrics.init_app(flask_app)
+    flask_app.context_processor(inject_user)
+    flask_app.register_blueprint(views)
+    flask_app.cli.add_command(grant_role)
+    if not flask_app.config.get('SKIP_MIGRATIONS'):
+        init_db()
+    # Load the issued-code filter off the request path
+    verifycache.get_cache().start_rebuild()
+    if PRELOAD_MODULES:
+        preload_modules()
+    return flask_app
+
+def __getattr__(name):
+    # `app`, the instance WSGI servers (gunicorn 'app:app'), `flask --app app`
+    # and the benchmarks use, is built on first access rather than at import,
+    # so importing this module has no side effects and create_app(config)
+    # can pick the database first
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # -------------------
 # Run App
 # -------------------
 if __name__ == '__main__':
-    init_db()
-    app.run(debug=True)
+    create_app().run(debug=True)
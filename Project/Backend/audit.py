@@ -0,0 +1,173 @@
+"""Ledger audit: re-hash prescriptions and check previous_hash links.
+
+    python audit.py              # resume from the last signed checkpoint
+    python audit.py --full       # ignore checkpoints, audit everything
+    python audit.py --workers 8 --chunk 20000
+
+Rows are streamed in rowid order in fixed-size chunks and re-hashed on a
+process pool. When the audit is clean, an HMAC-signed checkpoint records
+the last verified row so the next run only covers rows added since.
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from db import DB_FILE
+from ledger import generate_prescription_hash
+
+load_dotenv()
+AUDIT_KEY = os.getenv('AUDIT_KEY') or os.getenv('SECRET_KEY', 'fallback-key-for-dev')
+
+SELECT_CHUNK = '''
+    SELECT rowid, code, doctor_name, doctor_id, patient_name, date, medications, hash, previous_hash
+    FROM prescriptions WHERE rowid > ? ORDER BY rowid LIMIT ?
+'''
+
+
+def create_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS audit_checkpoints (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT,
+        last_rowid INTEGER,
+        last_hash TEXT,
+        rows_verified INTEGER,
+        signature TEXT
+    )''')
+
+
+def sign_checkpoint(last_rowid, last_hash, rows_verified):
+    message = f"{last_rowid}:{last_hash}:{rows_verified}".encode()
+    return hmac.new(AUDIT_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def load_checkpoint(conn):
+    """Latest checkpoint whose signature and anchor row still check out, else None."""
+    result = conn.execute('''SELECT last_rowid, last_hash, rows_verified, signature
+                             FROM audit_checkpoints ORDER BY id DESC LIMIT 1''').fetchone()
+    if not result:
+        return None
+    last_rowid, last_hash, rows_verified, signature = result
+    if not hmac.compare_digest(signature, sign_checkpoint(last_rowid, last_hash, rows_verified)):
+        print("WARNING: latest audit checkpoint has a bad signature, running a full audit")
+        return None
+    anchor = conn.execute("SELECT hash FROM prescriptions WHERE rowid=?", (last_rowid,)).fetchone()
+    if not anchor or anchor[0] != last_hash:
+        print("WARNING: checkpoint anchor row changed or is missing, running a full audit")
+        return None
+    return last_rowid, last_hash, rows_verified
+
+
+def save_checkpoint(conn, last_rowid, last_hash, rows_verified):
+    with conn:
+        conn.execute('''INSERT INTO audit_checkpoints (created_at, last_rowid, last_hash, rows_verified, signature)
+                        VALUES (?, ?, ?, ?, ?)''',
+                     (datetime.now(timezone.utc).isoformat(), last_rowid, last_hash, rows_verified,
+                      sign_checkpoint(last_rowid, last_hash, rows_verified)))
+
+
+def verify_chunk(rows, prev_hash):
+    """Worker: re-hash rows and check links. Returns a list of (rowid, code, problem)."""
+    problems = []
+    for rowid, code, doctor_name, doctor_id, patient_name, date, medications, stored, previous in rows:
+        expected = generate_prescription_hash({
+            'code': code,
+            'doctor_name': doctor_name,
+            'doctor_id': doctor_id,
+            'patient_name': patient_name,
+            'date': date,
+            'medications': medications.split(',')
+        })
+        if expected != stored:
+            problems.append((rowid, code, 'hash mismatch'))
+        if previous != prev_hash:
+            problems.append((rowid, code, 'broken previous_hash link'))
+        prev_hash = stored
+    return problems
+
+
+def iter_chunks(conn, after_rowid, chunk_size):
+    while True:
+        rows = conn.execute(SELECT_CHUNK, (after_rowid, chunk_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        after_rowid = rows[-1][0]
+
+
+def run_audit(db_file, workers=None, chunk_size=10000, full=False, checkpoint=True):
+    conn = sqlite3.connect(db_file)
+    create_tables(conn)
+
+    start_rowid, prev_hash, already = 0, '', 0
+    resumed = None if full else load_checkpoint(conn)
+    if resumed:
+        start_rowid, prev_hash, already = resumed
+
+    problems = []
+    verified = 0
+    last_rowid, last_hash = start_rowid, prev_hash
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Bound the chunks held in memory to a couple per worker
+        in_flight = deque()
+        max_in_flight = 2 * workers
+
+        def drain_one():
+            future, n = in_flight.popleft()
+            problems.extend(future.result())
+            return n
+
+        for rows in iter_chunks(conn, start_rowid, chunk_size):
+            in_flight.append((pool.submit(verify_chunk, rows, last_hash), len(rows)))
+            last_rowid, last_hash = rows[-1][0], rows[-1][7]
+            if len(in_flight) >= max_in_flight:
+                verified += drain_one()
+        while in_flight:
+            verified += drain_one()
+    elapsed = time.perf_counter() - started
+
+    if checkpoint and not problems and verified:
+        save_checkpoint(conn, last_rowid, last_hash, already + verified)
+    conn.close()
+    return {
+        'resumed_from_rowid': start_rowid,
+        'rows_verified': verified,
+        'rows_total': already + verified,
+        'seconds': elapsed,
+        'rows_per_second': verified / elapsed if elapsed else 0.0,
+        'problems': problems,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit the prescription hash chain.")
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk', type=int, default=10000)
+    parser.add_argument('--full', action='store_true', help="ignore saved checkpoints")
+    parser.add_argument('--no-checkpoint', action='store_true', help="don't save a checkpoint")
+    args = parser.parse_args()
+
+    report = run_audit(args.db, args.workers, args.chunk, args.full, not args.no_checkpoint)
+    print(f"Audited {report['rows_verified']} rows from rowid {report['resumed_from_rowid']} "
+          f"in {report['seconds']:.2f}s ({report['rows_per_second']:.0f} rows/s), "
+          f"{report['rows_total']} verified in total")
+    for rowid, code, problem in report['problems'][:50]:
+        print(f"  rowid {rowid} code {code}: {problem}")
+    if report['problems']:
+        print(f"FAILED: {len(report['problems'])} problem(s) found")
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Throughput of bulk prescription issuance (add_prescriptions_bulk).
+
+Issues batches of --sizes records into a fresh ledger, reports records/s,
+then runs a full audit to confirm every hash and previous_hash link.
+
+    python benchmarks/bench_bulk.py --sizes 10000 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rx-bulk-')
+    os.chdir(workdir)
+    # Always the throwaway database, even when DB_FILE is exported
+    os.environ['DB_FILE'] = os.path.join(workdir, 'prescriptions.db')
+
+    import app as app_module
+    import audit
+    import db
+
+    app_module.init_db()
+    total = 0
+    for size in args.sizes:
+        records = [{'doctor_name': f"Dr Bulk {i % 40}", 'doctor_id': f"D{i % 40}", 'patient_name': f"Patient {i}",
+                    'date': '2025-02-01', 'medications': ['Metformin 500mg x 60', 'Lisinopril 10mg x 30']}
+                   for i in range(size)]
+        start = time.perf_counter()
+        codes = app_module.add_prescriptions_bulk(records)
+        elapsed = time.perf_counter() - start
+        total += len(codes)
+        print(f"bulk {size:7d} records {elapsed:7.2f}s {size / elapsed:9.0f} records/s "
+              f"unique_codes={len(set(codes)) == size}")
+
+    report = audit.run_audit(db.DB_FILE, full=True, checkpoint=False)
+    print(f"audit rows={report['rows_verified']} expected={total} problems={len(report['problems'])}")
+
+
+if __name__ == '__main__':
+    main()
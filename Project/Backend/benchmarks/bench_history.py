@@ -0,0 +1,80 @@
+"""Keyset vs OFFSET pagination for the history endpoints on a large ledger.
+
+Seeds --rows prescriptions, then times fetching page N of one doctor's
+history and of the whole ledger by date, both by following cursors
+(history.page) and with the LIMIT/OFFSET query it replaces.
+
+    python benchmarks/bench_history.py --rows 200000 --pages 1 10 100 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+PAGE = 50
+
+
+def time_call(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--doctors', type=int, default=20)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100, 1000])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rx-history-')
+    os.chdir(workdir)
+    # Always the throwaway database, even when DB_FILE is exported
+    os.environ['DB_FILE'] = os.path.join(workdir, 'prescriptions.db')
+
+    import app as app_module
+    import db
+    import history
+
+    app_module.init_db()
+    records = [{'doctor_name': f"Dr {i % args.doctors}", 'doctor_id': f"D{i % args.doctors}",
+                'patient_name': f"Patient {i % 5000}", 'date': f"20{20 + i % 6}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+                'medications': ['Drug A 10mg', f"Drug B {i % 40}mg"]} for i in range(args.rows)]
+    start = time.perf_counter()
+    for i in range(0, len(records), 10000):
+        app_module.add_prescriptions_bulk(records[i:i + 10000])
+    print(f"workdir={workdir} rows={args.rows} seeded in {time.perf_counter() - start:.1f}s")
+
+    conn = db.connect()
+    cases = (('doctor D3', 'doctor_id', 'D3', "WHERE doctor_id = ?", ['D3']),
+             ('all by date', None, None, "", []))
+    for label, column, value, where, params in cases:
+        # Cursors for every page we will ask for, collected up front
+        cursors, cursor = {1: None}, None
+        for n in range(2, max(args.pages) + 1):
+            cursor = history.page(conn, column, value, cursor=cursor, limit=PAGE)['next_cursor']
+            if cursor is None:
+                break
+            cursors[n] = cursor
+        offset_sql = (f"SELECT code, doctor_name, doctor_id, patient_name, date FROM prescriptions {where} "
+                      f"ORDER BY date DESC, code DESC LIMIT ? OFFSET ?")
+        for n in args.pages:
+            if n not in cursors:
+                print(f"{label:12s} page {n:5d}  (past the last page)")
+                continue
+            keyset = time_call(lambda: history.page(conn, column, value, cursor=cursors[n], limit=PAGE))
+            offset = time_call(lambda: history.medications_for(
+                conn, [row[0] for row in conn.execute(offset_sql, params + [PAGE, (n - 1) * PAGE])]))
+            print(f"{label:12s} page {n:5d}  keyset {keyset * 1000:7.2f} ms  offset {offset * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Overhead of stage instrumentation on /verify and /download, metrics off vs on.
+
+Runs the same request mix with metrics.enabled toggled and prints mean
+per-request latency for each, plus the raw cost of one stage() block.
+Ends with a sample of /metrics and one Server-Timing header.
+
+    python benchmarks/bench_metrics.py --requests 3000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def timed_requests(client, paths, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        method, path, data = paths[i % len(paths)]
+        resp = client.post(path, data=data) if method == 'POST' else client.get(path)
+        assert resp.status_code == 200, (path, resp.status_code)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--seed-rows', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rx-metrics-')
+    os.chdir(workdir)
+    # Always the throwaway database, even when DB_FILE is exported
+    os.environ['DB_FILE'] = os.path.join(workdir, 'prescriptions.db')
+
+    import app as app_module
+    import metrics
+
+    app_module.init_db()
+    flask_app = app_module.app
+    flask_app.config['TESTING'] = True
+    codes = []
+    for i in range(args.seed_rows):
+        code = f"M{i:07d}"
+        app_module.add_prescription(code, None, f"Dr {i % 20}", 'D1', f"Patient {i}", '2025-01-01', ['Drug A 10mg'])
+        codes.append(code)
+
+    client = flask_app.test_client()
+    client.post('/signup', data={'username': 'v', 'password': 'pw', 'role': 'verifier',
+                                 'name': 'v', 'license_id': 'L', 'organization': 'Bench'})
+    client.post('/login', data={'username': 'v', 'password': 'pw'})
+    paths = [('POST', '/verify', {'code': code}) for code in codes]
+    paths += [('GET', f'/download/{code}', None) for code in codes]
+
+    disabled = timeit.timeit("with stage('x'): pass", globals={'stage': metrics.stage}, number=200000) / 200000
+    metrics.set_enabled(True)
+    on = timeit.timeit("with stage('x'): pass", globals={'stage': metrics.stage}, number=200000) / 200000
+    metrics.set_enabled(False)
+    metrics.reset()
+    print(f"stage() block: off {disabled * 1e9:6.0f} ns   on {on * 1e9:6.0f} ns")
+
+    timed_requests(client, paths, len(paths))  # warm the PDF cache and statement caches
+    results = {}
+    for label, flag in (('off', False), ('on', True), ('off', False), ('on', True)):
+        metrics.set_enabled(flag)
+        results.setdefault(label, []).append(timed_requests(client, paths, args.requests))
+    off, on = min(results['off']), min(results['on'])
+    print(f"request mean: off {off * 1e6:8.1f} us   on {on * 1e6:8.1f} us   overhead {(on - off) / off * 100:+.1f}%")
+
+    metrics.set_enabled(True)
+    resp = client.post('/verify', data={'code': codes[0]})
+    print("Server-Timing:", resp.headers.get('Server-Timing'))
+    body = client.get('/metrics').get_data(as_text=True)
+    print('\n'.join(line for line in body.splitlines() if '_count' in line or line.startswith('rx_')
+                    and '_bucket' not in line))
+
+
+if __name__ == '__main__':
+    main()
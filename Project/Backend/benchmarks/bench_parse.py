@@ -0,0 +1,90 @@
+"""Throughput and accuracy of parse_prescription_text on the golden corpora.
+
+Compares every parsed field with the expected values in parse_corpus.jsonl
+(generated by make_parse_corpus.py) and parse_samples.jsonl (hand-written
+from real OCR output and PDF text extraction, kept apart so the generator
+and the parser cannot share blind spots). Reports per-field accuracy for
+each and documents/s. Against the stored parse_baseline.json it fails
+(exit 1) if any field's accuracy dropped, and warns if throughput fell by
+more than --tolerance.
+
+    python benchmarks/bench_parse.py
+    python benchmarks/bench_parse.py --update-baseline
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from prescription_parser import FIELDS, parse_prescription_text
+
+CORPORA = (('synthetic', os.path.join(HERE, 'parse_corpus.jsonl')),
+           ('samples', os.path.join(HERE, 'parse_samples.jsonl')))
+BASELINE = os.path.join(HERE, 'parse_baseline.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--tolerance', type=float, default=0.3)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--show-misses', type=int, default=0)
+    args = parser.parse_args()
+
+    accuracy = {}
+    misses = []
+    texts = []
+    for name, path in CORPORA:
+        with open(path) as f:
+            cases = [json.loads(line) for line in f if line.strip()]
+        correct = dict.fromkeys(FIELDS, 0)
+        for case in cases:
+            parsed = parse_prescription_text(case['text'])
+            for field in FIELDS:
+                if parsed[field] == case['expected'][field]:
+                    correct[field] += 1
+                else:
+                    misses.append((name, field, case['expected'][field], parsed[field]))
+        accuracy[name] = {field: round(correct[field] / len(cases), 4) for field in FIELDS}
+        texts += [case['text'] for case in cases]
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for text in texts:
+            parse_prescription_text(text)
+    docs_per_second = round(args.rounds * len(texts) / (time.perf_counter() - start))
+
+    for field in FIELDS:
+        print(f"{field:14s} " + '  '.join(f"{name}={accuracy[name][field]:.4f}" for name, _ in CORPORA))
+    print(f"throughput     {docs_per_second} docs/s over {len(texts)} cases")
+    for name, field, expected, got in misses[:args.show_misses]:
+        print(f"  miss {name} {field}: expected {expected!r} got {got!r}")
+
+    if args.update_baseline:
+        with open(BASELINE, 'w') as f:
+            json.dump({'accuracy': accuracy, 'docs_per_second': docs_per_second}, f, indent=2)
+            f.write('\n')
+        print(f"baseline written to {BASELINE}")
+        return
+
+    if not os.path.exists(BASELINE):
+        return
+    with open(BASELINE) as f:
+        baseline = json.load(f)
+    regressed = [(name, f) for name, _ in CORPORA for f in FIELDS
+                 if accuracy[name][f] < baseline['accuracy'].get(name, {}).get(f, 0)]
+    for name, field in regressed:
+        print(f"REGRESSION: {name} {field} accuracy {accuracy[name][field]:.4f} "
+              f"< baseline {baseline['accuracy'][name][field]:.4f}")
+    if docs_per_second < baseline['docs_per_second'] * (1 - args.tolerance):
+        print(f"WARNING: throughput {docs_per_second} docs/s is more than {args.tolerance:.0%} below "
+              f"baseline {baseline['docs_per_second']} docs/s")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
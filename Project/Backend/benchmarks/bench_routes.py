@@ -0,0 +1,90 @@
+"""Requests-per-second benchmark for the /verify and /create routes.
+
+Runs the Flask app in-process against a throwaway database in a temp
+directory, so it never touches the real prescriptions.db.
+
+    python benchmarks/bench_routes.py --requests 2000 --threads 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def make_client(app, username, password, role):
+    client = app.test_client()
+    client.post('/signup', data={
+        'username': username, 'password': password, 'role': role,
+        'name': username, 'license_id': 'LIC-1', 'organization': 'Bench'
+    })
+    client.post('/login', data={'username': username, 'password': password})
+    return client
+
+
+def run(label, app, role, threads, total, request_fn):
+    per_thread = total // threads
+    clients = [make_client(app, f'{role}{i}', 'pw', role) for i in range(threads)]
+    errors = []
+
+    def worker(client, n):
+        for i in range(n):
+            resp = request_fn(client, i)
+            if resp.status_code != 200:
+                errors.append(resp.status_code)
+
+    workers = [threading.Thread(target=worker, args=(c, per_thread)) for c in clients]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    done = per_thread * threads
+    print(f"{label:10s} {done:6d} req  {elapsed:7.2f}s  {done / elapsed:8.1f} req/s  errors={len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seed-rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rx-bench-')
+    os.chdir(workdir)
+    # Always the throwaway database, even when DB_FILE is exported
+    os.environ['DB_FILE'] = os.path.join(workdir, 'prescriptions.db')
+
+    import app as app_module
+    app_module.init_db()
+    flask_app = app_module.app
+    flask_app.config['TESTING'] = True
+
+    codes = []
+    for i in range(args.seed_rows):
+        code = f"B{i:07d}"
+        app_module.add_prescription(code, None, f"Dr {i % 50}", f"D{i % 50}",
+                                    f"Patient {i}", '2025-01-01', ['Drug A 10mg', 'Drug B 5mg'])
+        codes.append(code)
+
+    def do_create(client, i):
+        return client.post('/create', data={
+            'doctor_name': 'Dr Bench', 'doctor_id': 'D1', 'patient_name': f'P{i}',
+            'date': '2025-01-02', 'medications': 'Drug A 10mg,Drug B 5mg'
+        })
+
+    def do_verify(client, i):
+        return client.post('/verify', data={'code': codes[i % len(codes)]})
+
+    print(f"workdir={workdir} threads={args.threads} seed_rows={args.seed_rows}")
+    run('/verify', flask_app, 'verifier', args.threads, args.requests, do_verify)
+    run('/create', flask_app, 'issuer', args.threads, args.requests, do_create)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Latency and recall of the fuzzy verify() fallback as the ledger grows.
+
+Fills prescriptions and the trigram search index at each size, then looks
+up OCR-style corrupted copies of random rows (dropped/swapped characters,
+odd casing and punctuation) and reports p50/p99 latency and top-1 recall.
+false_accepts counts lookups that matched a patient not in the ledger or
+matched on the doctor's name alone.
+
+    python benchmarks/bench_search.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import search
+
+FIRST = ['James', 'Maria', 'Chen', 'Aisha', 'Olga', 'Pedro', 'Kofi', 'Yuki', 'Liam', 'Fatima', 'Noah', 'Priya']
+LAST = ['Smith', 'Garcia', 'Nguyen', 'Okafor', 'Ivanova', 'Silva', 'Mensah', 'Tanaka', 'Murphy', 'Haddad',
+        'Johnson', 'Patel', 'Kowalski', 'Rossi', 'Novak', 'Schmidt']
+
+
+def person(rng):
+    return f"{rng.choice(FIRST)} {rng.choice(LAST)}-{rng.randint(1, 99999)}"
+
+
+def ocr_noise(rng, value):
+    chars = list(value)
+    for _ in range(rng.randint(0, 2)):
+        i = rng.randrange(len(chars))
+        op = rng.choice(('drop', 'swap', 'confuse'))
+        if op == 'drop' and len(chars) > 4:
+            del chars[i]
+        elif op == 'swap' and i + 1 < len(chars):
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        else:
+            chars[i] = {'o': '0', 'l': '1', 's': '5', 'e': 'c'}.get(chars[i].lower(), chars[i])
+    noisy = ''.join(chars)
+    return noisy.upper() if rng.random() < 0.3 else noisy
+
+
+def fill(conn, start, count, rng):
+    rows = []
+    for i in range(start, start + count):
+        rows.append((f"S{i:09d}", f"Dr. {person(rng)}", f"D{i % 997}", person(rng),
+                     f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", 'Drug A', '', ''))
+    with conn:
+        conn.executemany("INSERT INTO prescriptions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        for code, doctor_name, _, patient_name, date, *_ in rows:
+            search.index_prescription(conn, code, doctor_name, patient_name, date)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    conn = sqlite3.connect(os.path.join(tempfile.mkdtemp(prefix='rx-search-'), 'prescriptions.db'))
+    conn.execute('''CREATE TABLE prescriptions (code TEXT PRIMARY KEY, doctor_name TEXT, doctor_id TEXT,
+                    patient_name TEXT, date TEXT, medications TEXT, hash TEXT, previous_hash TEXT)''')
+    search.create_tables(conn)
+
+    size = 0
+    for target in sorted(args.sizes):
+        while size < target:
+            step = min(50000, target - size)
+            fill(conn, size, step, rng)
+            size += step
+        sample = conn.execute("SELECT code, doctor_name, patient_name, date FROM prescriptions "
+                              "ORDER BY random() LIMIT ?", (args.queries,)).fetchall()
+        latencies, hits, false_accepts = [], 0, 0
+        for code, doctor_name, patient_name, date in sample:
+            parsed = {'doctor_name': ocr_noise(rng, doctor_name), 'patient_name': ocr_noise(rng, patient_name),
+                      'date': date}
+            start = time.perf_counter()
+            ranked = search.find_candidates(conn, parsed)
+            latencies.append(time.perf_counter() - start)
+            hits += bool(ranked) and ranked[0][1] == code
+            # The same doctor and date for a patient who is not in the ledger,
+            # and the doctor's name alone, must not match anything
+            stranger = {'doctor_name': doctor_name, 'patient_name': person(rng), 'date': date}
+            false_accepts += bool(search.find_candidates(conn, stranger))
+            false_accepts += bool(search.find_candidates(conn, {'doctor_name': doctor_name}))
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        print(f"rows={size:8d} p50={p50:7.2f}ms p99={p99:7.2f}ms recall@1={hits / len(sample):.3f} "
+              f"false_accepts={false_accepts}")
+
+
+if __name__ == '__main__':
+    main()
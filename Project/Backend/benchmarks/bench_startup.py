@@ -0,0 +1,90 @@
+"""Worker startup time: `import app` and building `app.app`, lazy vs preloaded.
+
+Each sample is a fresh interpreter, as a pre-forked worker or a cold
+container would be. Also times the first /download in a fresh lazy worker,
+where the PDF stack is imported on demand. Then it runs `python -X
+importtime` and lists the most expensive imports.
+
+    python benchmarks/bench_startup.py --runs 10 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP = '''
+import time
+start = time.perf_counter()
+import app
+app.app
+print(time.perf_counter() - start)
+'''
+
+FIRST_DOWNLOAD = '''
+import time
+import app
+client = app.app.test_client()
+app.add_prescription('STARTUP1', None, 'Dr A', 'D1', 'Patient', '2025-01-01', ['Drug A 10mg'])
+client.post('/signup', data={'username': 'u', 'password': 'pw', 'role': 'verifier',
+                             'name': 'u', 'license_id': 'L', 'organization': 'Bench'})
+client.post('/login', data={'username': 'u', 'password': 'pw'})
+start = time.perf_counter()
+assert client.get('/download/STARTUP1').status_code == 200
+print(time.perf_counter() - start)
+'''
+
+
+def run_python(code, workdir, env_extra=None, flags=()):
+    env = dict(os.environ, DB_FILE=os.path.join(workdir, 'prescriptions.db'), **(env_extra or {}))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get('PYTHONPATH')]))
+    return subprocess.run([sys.executable, *flags, '-c', code], cwd=workdir, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def sample(code, runs, env_extra=None):
+    times = []
+    for _ in range(runs):
+        workdir = tempfile.mkdtemp(prefix='rx-startup-')
+        times.append(float(run_python(code, workdir, env_extra).stdout.split()[-1]))
+    return times
+
+
+def import_profile(top):
+    """(cumulative_us, module) for the slowest top-level imports under `import app`."""
+    workdir = tempfile.mkdtemp(prefix='rx-importtime-')
+    stderr = run_python('import app; app.app', workdir, flags=('-X', 'importtime')).stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Only modules imported directly by app.py's own import chain
+        if len(name) - len(name.lstrip()) <= 3:
+            entries.append((int(cumulative), name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    for label, env_extra in (('lazy', None), ('preloaded', {'PRELOAD_MODULES': '1'})):
+        times = sample(STARTUP, args.runs, env_extra)
+        print(f"import app + app.app  {label:9s} median {statistics.median(times) * 1000:7.1f} ms  "
+              f"min {min(times) * 1000:7.1f} ms  over {args.runs} runs")
+    times = sample(FIRST_DOWNLOAD, max(1, args.runs // 2))
+    print(f"first /download in a lazy worker   median {statistics.median(times) * 1000:7.1f} ms")
+
+    print(f"\nslowest imports under `import app` (lazy), cumulative:")
+    for cumulative, name in import_profile(args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
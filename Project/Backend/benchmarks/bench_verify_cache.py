@@ -0,0 +1,136 @@
+"""Load test for the verification cache with a mix of repeat, cold and unknown codes.
+
+Seeds a ledger, then drives POST /verify from several threads. Each request
+draws a popular code (--hot), any issued code (--cold) or a code that was
+never issued (--unknown, typos and guessing). The mix runs once with the
+cache bypassed and once through it, reporting req/s, SQLite prescription
+lookups and the cache counters.
+
+    python benchmarks/bench_verify_cache.py --rows 50000 --requests 20000 --threads 8
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def make_mix(codes, args, rng):
+    issued = set(codes)
+    hot = rng.sample(codes, min(args.hot_codes, len(codes)))
+    total = args.hot + args.cold + args.unknown
+    mix = []
+    for _ in range(args.requests):
+        r = rng.random() * total
+        if r < args.hot:
+            mix.append(rng.choice(hot))
+        elif r < args.hot + args.cold:
+            mix.append(rng.choice(codes))
+        else:
+            code = ''.join(rng.choices(string.ascii_uppercase + string.digits, k=8))
+            while code in issued:
+                code = ''.join(rng.choices(string.ascii_uppercase + string.digits, k=8))
+            mix.append(code)
+    return mix
+
+
+def drive(app, mix, threads):
+    clients = []
+    for i in range(threads):
+        client = app.test_client()
+        client.post('/login', data={'username': 'verifier', 'password': 'pw'})
+        clients.append(client)
+    errors = []
+
+    def worker(client, part):
+        for code in part:
+            resp = client.post('/verify', data={'code': code})
+            if resp.status_code != 200:
+                errors.append(resp.status_code)
+
+    workers = [threading.Thread(target=worker, args=(c, mix[i::threads])) for i, c in enumerate(clients)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return time.perf_counter() - start, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--hot-codes', type=int, default=200)
+    parser.add_argument('--hot', type=float, default=0.6)
+    parser.add_argument('--cold', type=float, default=0.2)
+    parser.add_argument('--unknown', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=14)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rx-vcache-')
+    os.chdir(workdir)
+    # Always the throwaway database, even when DB_FILE is exported
+    os.environ['DB_FILE'] = os.path.join(workdir, 'prescriptions.db')
+
+    import app as app_module
+    import verifycache
+
+    app_module.init_db()
+    flask_app = app_module.app
+    flask_app.config['TESTING'] = True
+    records = [{'doctor_name': f"Dr {i % 40}", 'doctor_id': f"D{i % 40}", 'patient_name': f"Patient {i}",
+                'date': '2025-01-01', 'medications': ['Drug A 10mg']} for i in range(args.rows)]
+    codes = []
+    for i in range(0, len(records), 5000):
+        codes += app_module.add_prescriptions_bulk(records[i:i + 5000])
+    flask_app.test_client().post('/signup', data={'username': 'verifier', 'password': 'pw', 'role': 'verifier',
+                                                  'name': 'v', 'license_id': 'L', 'organization': 'Bench'})
+
+    lookups = [0]
+    load_prescription = app_module.load_prescription
+
+    def counting_load(code):
+        lookups[0] += 1
+        return load_prescription(code)
+
+    app_module.load_prescription = counting_load
+    cached_get, cached_proof = app_module.get_prescription, app_module.get_inclusion_proof
+    mix = make_mix(codes, args, random.Random(args.seed))
+    print(f"workdir={workdir} rows={args.rows} requests={args.requests} threads={args.threads} "
+          f"mix hot/cold/unknown={args.hot}/{args.cold}/{args.unknown}")
+
+    for label in ('no cache', 'cache'):
+        if label == 'no cache':
+            app_module.get_prescription = counting_load
+            app_module.get_inclusion_proof = app_module.load_inclusion_proof
+        else:
+            app_module.get_prescription, app_module.get_inclusion_proof = cached_get, cached_proof
+            verifycache.get_cache().reset()
+        lookups[0] = 0
+        elapsed, errors = drive(flask_app, mix, args.threads)
+        print(f"{label:9s} {len(mix) / elapsed:8.1f} req/s  sqlite lookups={lookups[0]:6d}  errors={errors}")
+
+    # The same mix without HTTP, to show the lookup cost on its own
+    with flask_app.app_context():
+        for label, lookup in (('no cache', load_prescription), ('cache', cached_get)):
+            start = time.perf_counter()
+            for code in mix:
+                lookup(code)
+            print(f"{label:9s} direct lookup {(time.perf_counter() - start) / len(mix) * 1e6:7.1f} us")
+
+    cache = verifycache.get_cache()
+    print(f"cache     hits={cache.hits} filter_rejects={cache.filter_rejects} misses={cache.misses} "
+          f"false_positives={cache.false_positives} hit_rate={cache.hit_rate():.3f} "
+          f"filter_bits={cache._filter.size} hashes={cache._filter.hashes}")
+
+
+if __name__ == '__main__':
+    main()
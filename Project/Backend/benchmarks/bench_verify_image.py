@@ -0,0 +1,100 @@
+"""p50/p99 latency of image uploads to /verify, with and without a QR code.
+
+Scans are simulated as letter-size 200dpi pages with the prescription text
+and, for "qr" uploads, the QR code in the top-right corner like our PDFs.
+OCR is a stub that sleeps --ocr-latency seconds to stand in for OCR.Space.
+
+    python benchmarks/bench_verify_image.py --uploads 200 --ocr-latency 0.8
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def scan_image(code, fields, with_qr):
+    import qrcode
+    from PIL import Image, ImageDraw
+
+    page = Image.new('RGB', (1700, 2200), 'white')
+    draw = ImageDraw.Draw(page)
+    y = 150
+    for line in [f"Prescription Code: {code}"] + [f"{k}: {v}" for k, v in fields.items()]:
+        draw.text((150, y), line, fill='black')
+        y += 60
+    if with_qr:
+        qr = qrcode.QRCode(box_size=10, border=2)
+        qr.add_data(code)
+        qr.make(fit=True)
+        page.paste(qr.make_image(fill_color="black", back_color="white").convert("RGB"), (1250, 120))
+    buf = BytesIO()
+    page.save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uploads', type=int, default=100)
+    parser.add_argument('--ocr-latency', type=float, default=0.8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rx-image-')
+    os.chdir(workdir)
+    # Always the throwaway database, even when DB_FILE is exported
+    os.environ['DB_FILE'] = os.path.join(workdir, 'prescriptions.db')
+
+    import app as app_module
+    import ocr
+
+    class SlowStub(ocr.StubBackend):
+        def extract_text(self, image_bytes, timeout):
+            time.sleep(args.ocr_latency)
+            return super().extract_text(image_bytes, timeout)
+
+    app_module.init_db()
+    stub = SlowStub()
+    ocr.set_backend(stub)
+
+    images = {'qr': [], 'no-qr': []}
+    for i in range(args.uploads):
+        code = f"IMG{i:05d}"
+        fields = {'Doctor Name': f"Dr Bench {i % 7}", 'Patient Name': f"Patient {i}", 'Date': '2025-01-01'}
+        app_module.add_prescription(code, None, fields['Doctor Name'], 'D1', fields['Patient Name'],
+                                    fields['Date'], ['Drug A 10mg'])
+        text = '\n'.join([f"Prescription Code: {code}"] + [f"{k}: {v}" for k, v in fields.items()])
+        for kind in images:
+            data = scan_image(code, fields, kind == 'qr')
+            stub.texts[hashlib.sha256(data).hexdigest()] = text
+            images[kind].append(data)
+
+    client = app_module.app.test_client()
+    client.post('/signup', data={'username': 'bench', 'password': 'pw', 'role': 'verifier',
+                                 'name': 'bench', 'license_id': 'L', 'organization': 'Bench'})
+    client.post('/login', data={'username': 'bench', 'password': 'pw'})
+
+    for kind, uploads in images.items():
+        ocr.get_ocr().cache.clear()
+        calls_before = stub.calls
+        latencies = []
+        for data in uploads:
+            start = time.perf_counter()
+            client.post('/verify', data={'prescription': (BytesIO(data), 'scan.png')},
+                        content_type='multipart/form-data')
+            latencies.append(time.perf_counter() - start)
+        print(f"{kind:6s} uploads={len(uploads):4d} p50={percentile(latencies, 0.5) * 1000:8.1f}ms "
+              f"p99={percentile(latencies, 0.99) * 1000:8.1f}ms ocr_calls={stub.calls - calls_before}")
+
+
+if __name__ == '__main__':
+    main()
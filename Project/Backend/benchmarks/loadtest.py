@@ -0,0 +1,381 @@
+"""Reproducible load test of the Flask routes over real HTTP, with a local OCR stand-in.
+
+1. Seeds a synthetic ledger of --ledger-size prescriptions in a temp dir.
+2. Builds --artifacts prescription PDFs with get_prescription_pdf, the
+   /download code path, and matching phone-scan PNGs that carry the same
+   QR image. Each scan's text is registered with the stub OCR server.
+3. Starts benchmarks/stub_ocr_server.py and the app (threaded Werkzeug
+   server), each in its own process, with OCR_API_URL pointing at the stub.
+4. Drives a seeded mix of /login, /create, /verify (by code, PDF, image)
+   and /download from --concurrency client threads.
+5. Prints throughput and latency percentiles per operation. Compares
+   them against loadtest_baseline.json and exits 1 on a regression
+   beyond --tolerance (--p99-tolerance for tail latency). The baseline
+   is machine-specific; re-record it on the machine that runs the check.
+
+    python benchmarks/loadtest.py --ledger-size 20000 --requests 3000 --concurrency 8
+    python benchmarks/loadtest.py --update-baseline
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(HERE)
+sys.path.insert(0, BACKEND_DIR)
+BASELINE = os.path.join(HERE, 'loadtest_baseline.json')
+
+DEFAULT_MIX = 'login=5,create=10,verify_code=35,verify_pdf=15,verify_image=10,download=25'
+PASSWORD = 'loadtest-pw'
+VERIFIED_MARK = 'Valid &amp; Verified Prescription'
+
+
+# -------------------
+# Fixtures
+# -------------------
+def seed_ledger(app_module, size, rng):
+    records = [{'doctor_name': f"Dr {rng.choice(['Okafor', 'Nguyen', 'Silva', 'Haddad'])} {i % 97}",
+                'doctor_id': f"LIC-{10000 + i % 97}", 'patient_name': f"Patient {i}",
+                'date': f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}",
+                'medications': rng.sample(['Amoxicillin 500mg x 20', 'Ibuprofen 200mg x 30',
+                                           'Metformin 850mg x 60', 'Lisinopril 10mg x 30'], 2)}
+               for i in range(size)]
+    codes = []
+    for i in range(0, len(records), 10000):
+        codes += app_module.add_prescriptions_bulk(records[i:i + 10000])
+    return codes
+
+
+def scan_image(app_module, db_entry):
+    """A letter-size 200dpi 'phone scan' of a prescription, with its printed QR code."""
+    from PIL import Image, ImageDraw
+
+    page = Image.new('RGB', (1700, 2200), 'white')
+    draw = ImageDraw.Draw(page)
+    lines = scan_text(db_entry).splitlines()
+    for n, line in enumerate(lines):
+        draw.text((150, 150 + 60 * n), line, fill='black')
+    qr = app_module.prescription_qr_image(db_entry[0])
+    page.paste(qr.resize((qr.width * 5, qr.height * 5), Image.NEAREST), (1250, 120))
+    buf = BytesIO()
+    page.save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def scan_text(db_entry):
+    return '\n'.join([f"Prescription Code: {db_entry[0]}", f"Doctor Name: {db_entry[1]}",
+                      f"Doctor ID: {db_entry[2]}", f"Patient Name: {db_entry[3]}", f"Date: {db_entry[4]}",
+                      "Medications (with Quantity):"] + [f"- {med}" for med in db_entry[8]])
+
+
+def build_artifacts(app_module, codes, count, workdir):
+    """[(code, pdf_bytes, png_bytes)] and the sha256 -> text map for the OCR stub."""
+    artifacts, texts = [], {}
+    for code in codes[:count]:
+        db_entry = app_module.get_prescription(code)
+        pdf_bytes, _ = app_module.get_prescription_pdf(db_entry)
+        png = scan_image(app_module, db_entry)
+        texts[hashlib.sha256(png).hexdigest()] = scan_text(db_entry)
+        artifacts.append((code, pdf_bytes, png))
+    texts_path = os.path.join(workdir, 'ocr_texts.json')
+    with open(texts_path, 'w') as f:
+        json.dump(texts, f)
+    return artifacts, texts_path
+
+
+# -------------------
+# Processes under test
+# -------------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_ocr_stub(texts_path, latency, jitter):
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, 'stub_ocr_server.py'), '--port', '0',
+                             '--texts', texts_path, '--latency', str(latency), '--jitter', str(jitter)],
+                            stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line.startswith('listening on'):
+        proc.kill()
+        raise RuntimeError("stub OCR server did not start")
+    return proc, int(line.split()[-1])
+
+
+def start_app(workdir, env, port):
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    code = ("import app; app.app.run(host='127.0.0.1', port=%d, threaded=True, use_reloader=False)" % port)
+    proc = subprocess.Popen([sys.executable, '-c', code], cwd=workdir, env=env, stdout=log, stderr=log)
+    return proc, log
+
+
+def wait_until_up(base_url, proc, timeout=30):
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("app server exited during startup; see server.log")
+        try:
+            if requests.get(base_url + '/ledger/root', timeout=1).status_code == 200:
+                return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError("app server did not come up in time")
+
+
+# -------------------
+# Traffic
+# -------------------
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split('=')
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"unknown operations in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def login(session, base_url, username):
+    return session.post(base_url + '/login', data={'username': username, 'password': PASSWORD}, timeout=60)
+
+
+def op_login(ctx, rng):
+    import requests
+
+    with requests.Session() as session:
+        resp = login(session, ctx['base_url'], rng.choice(['issuer', 'verifier']))
+    return resp.status_code == 200 and 'Invalid username' not in resp.text
+
+
+def op_create(ctx, rng):
+    resp = ctx['issuer'].post(ctx['base_url'] + '/create', data={
+        'doctor_name': 'Dr Load Test', 'doctor_id': 'LIC-LOAD', 'patient_name': f"Load Patient {rng.randrange(10**6)}",
+        'date': '2025-06-01', 'medications': 'Amoxicillin 500mg x 20,Ibuprofen 200mg x 30'}, timeout=60)
+    return resp.status_code == 200 and 'Access denied' not in resp.text
+
+
+def op_verify_code(ctx, rng):
+    resp = ctx['verifier'].post(ctx['base_url'] + '/verify', data={'code': rng.choice(ctx['codes'])}, timeout=60)
+    return resp.status_code == 200 and VERIFIED_MARK in resp.text
+
+
+def op_verify_pdf(ctx, rng):
+    code, pdf_bytes, _ = rng.choice(ctx['artifacts'])
+    resp = ctx['verifier'].post(ctx['base_url'] + '/verify',
+                                files={'prescription': (f"Prescription_{code}.pdf", pdf_bytes, 'application/pdf')},
+                                timeout=60)
+    return resp.status_code == 200 and VERIFIED_MARK in resp.text
+
+
+def op_verify_image(ctx, rng):
+    code, _, png = rng.choice(ctx['artifacts'])
+    resp = ctx['verifier'].post(ctx['base_url'] + '/verify',
+                                files={'prescription': (f"scan_{code}.png", png, 'image/png')}, timeout=60)
+    return resp.status_code == 200 and VERIFIED_MARK in resp.text
+
+
+def op_download(ctx, rng):
+    resp = ctx['verifier'].get(ctx['base_url'] + f"/download/{rng.choice(ctx['codes'])}", timeout=60)
+    return resp.status_code == 200 and resp.headers.get('Content-Type', '').startswith('application/pdf')
+
+
+OPERATIONS = {
+    'login': op_login,
+    'create': op_create,
+    'verify_code': op_verify_code,
+    'verify_pdf': op_verify_pdf,
+    'verify_image': op_verify_image,
+    'download': op_download,
+}
+
+
+def run_client(ctx, mix, count, seed, samples):
+    import requests
+
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    with requests.Session() as issuer, requests.Session() as verifier:
+        login(issuer, ctx['base_url'], 'issuer')
+        login(verifier, ctx['base_url'], 'verifier')
+        client_ctx = dict(ctx, issuer=issuer, verifier=verifier)
+        for _ in range(count):
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = OPERATIONS[name](client_ctx, rng)
+            except Exception as e:
+                print(f"{name} failed: {e}")
+                ok = False
+            samples.append((name, time.perf_counter() - start, ok))
+
+
+def drive(ctx, mix, requests_total, concurrency, seed):
+    samples = []
+    per_client = requests_total // concurrency
+    threads = [threading.Thread(target=run_client, args=(ctx, mix, per_client, seed * 1000 + i, samples))
+               for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - start
+
+
+# -------------------
+# Reporting and baseline
+# -------------------
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def summarize(samples, elapsed):
+    summary = {'throughput': len(samples) / elapsed, 'requests': len(samples),
+               'errors': sum(1 for _, _, ok in samples if not ok), 'operations': {}}
+    for name in OPERATIONS:
+        latencies = [t for n, t, _ in samples if n == name]
+        if not latencies:
+            continue
+        summary['operations'][name] = {
+            'count': len(latencies),
+            'errors': sum(1 for n, _, ok in samples if n == name and not ok),
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p90_ms': percentile(latencies, 0.90) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': max(latencies) * 1000,
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'operation':13s} {'count':>6s} {'errors':>6s} {'p50 ms':>9s} {'p90 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    for name, op in summary['operations'].items():
+        print(f"{name:13s} {op['count']:6d} {op['errors']:6d} {op['p50_ms']:9.1f} {op['p90_ms']:9.1f} "
+              f"{op['p99_ms']:9.1f} {op['max_ms']:9.1f}")
+    print(f"total {summary['requests']} requests, {summary['errors']} errors, {summary['throughput']:.1f} req/s")
+
+
+def compare(summary, baseline, tolerance, p99_tolerance):
+    """Regression messages against a stored baseline (empty list means none)."""
+    problems = []
+    if summary['throughput'] < baseline['throughput'] * (1 - tolerance):
+        problems.append(f"throughput {summary['throughput']:.1f} req/s < baseline {baseline['throughput']:.1f}")
+    if summary['errors'] > baseline.get('errors', 0):
+        problems.append(f"errors {summary['errors']} > baseline {baseline.get('errors', 0)}")
+    for name, op in summary['operations'].items():
+        base = baseline['operations'].get(name)
+        if not base:
+            continue
+        for key, allowed in (('p50_ms', tolerance), ('p99_ms', p99_tolerance)):
+            if op[key] > base[key] * (1 + allowed):
+                problems.append(f"{name} {key} {op[key]:.1f} > baseline {base[key]:.1f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ledger-size', type=int, default=20000)
+    parser.add_argument('--artifacts', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--ocr-latency', type=float, default=0.3)
+    parser.add_argument('--ocr-jitter', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=17)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    # Tail latency on a shared machine swings far more than the median
+    parser.add_argument('--p99-tolerance', type=float, default=0.75)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--output', help='also write the summary as JSON here')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    workdir = tempfile.mkdtemp(prefix='rx-load-')
+    os.chdir(workdir)
+    env = dict(os.environ, DB_FILE=os.path.join(workdir, 'prescriptions.db'), OCR_BACKEND='ocrspace',
+               OCR_API_KEY='loadtest')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get('PYTHONPATH')]))
+    os.environ['DB_FILE'] = env['DB_FILE']
+
+    import app as app_module
+
+    app_module.init_db()
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    codes = seed_ledger(app_module, args.ledger_size, rng)
+    client = app_module.app.test_client()
+    for role in ('issuer', 'verifier'):
+        client.post('/signup', data={'username': role, 'password': PASSWORD, 'role': role,
+                                     'name': role, 'license_id': 'LIC-LOAD', 'organization': 'Load Test'})
+    artifacts, texts_path = build_artifacts(app_module, codes, args.artifacts, workdir)
+    print(f"workdir={workdir} ledger={len(codes)} artifacts={len(artifacts)} "
+          f"prepared in {time.perf_counter() - start:.1f}s")
+
+    ocr_proc = app_proc = log = None
+    try:
+        ocr_proc, ocr_port = start_ocr_stub(texts_path, args.ocr_latency, args.ocr_jitter)
+        env['OCR_API_URL'] = f"http://127.0.0.1:{ocr_port}/parse/image"
+        port = free_port()
+        app_proc, log = start_app(workdir, env, port)
+        base_url = f"http://127.0.0.1:{port}"
+        wait_until_up(base_url, app_proc)
+
+        ctx = {'base_url': base_url, 'codes': codes, 'artifacts': artifacts}
+        if args.warmup:
+            drive(ctx, mix, args.warmup, args.concurrency, args.seed + 1)
+        samples, elapsed = drive(ctx, mix, args.requests, args.concurrency, args.seed)
+    finally:
+        for proc in (app_proc, ocr_proc):
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=10)
+        if log is not None:
+            log.close()
+
+    summary = summarize(samples, elapsed)
+    summary['config'] = {k: getattr(args, k) for k in ('ledger_size', 'artifacts', 'requests', 'concurrency',
+                                                       'mix', 'ocr_latency', 'ocr_jitter', 'seed')}
+    print_summary(summary)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(summary, f, indent=2)
+            f.write('\n')
+        print(f"baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("no baseline yet; run with --update-baseline to record one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('config') != summary['config']:
+        print("WARNING: baseline was recorded with different settings; comparison is approximate")
+    problems = compare(summary, baseline, args.tolerance, args.p99_tolerance)
+    for problem in problems:
+        print("REGRESSION:", problem)
+    if problems:
+        sys.exit(1)
+    print(f"no regressions (p50/throughput within {args.tolerance:.0%}, p99 within {args.p99_tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
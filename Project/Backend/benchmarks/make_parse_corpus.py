@@ -0,0 +1,83 @@
+"""Generate the synthetic OCR corpus used by bench_parse.py.
+
+Each line of parse_corpus.jsonl is {"text": ..., "expected": {...}} where
+expected holds the true field values. The texts mimic what PyPDF2 pulls out
+of our own PDFs and what OCR.Space returns for phone photos of them: label
+case and spacing drift, dropped colons, dash separators, bulleted or
+inline medication lists, clinic headers and trailing notes.
+
+    python benchmarks/make_parse_corpus.py --count 300
+"""
+import argparse
+import json
+import os
+import random
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(HERE, 'parse_corpus.jsonl')
+
+FIRST = ['James', 'Maria', 'Chen', 'Aisha', 'Olga', 'Pedro', 'Kofi', 'Yuki', 'Liam', 'Fatima', "Siobhan", 'Jean-Luc']
+LAST = ['Smith', 'Garcia', 'Nguyen', 'Okafor', 'Ivanova', 'Silva', 'Mensah', 'Tanaka', "O'Brien", 'Haddad']
+DRUGS = ['Amoxicillin 500mg x 20', 'Ibuprofen 200mg x 30', 'Codeine 30mg x 10', 'Metformin 850mg x 60',
+         'Lisinopril 10mg x 30', 'Atorvastatin 20mg x 28', 'Salbutamol inhaler x 1', 'Omeprazole 20mg x 14']
+HEADERS = ['CITY GENERAL CLINIC', 'Prescription', 'Orlando Health Partners', 'Rx', 'Phone: 407-555-0134']
+TRAILERS = ['Signature: ______', 'Notes: take with food', 'Ledger Proof (leaf 3 of 9)', 'Refills 0']
+CODE_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+
+def label(rng, words, separators=(': ', ':', ' : ', ' - ')):
+    text = ' '.join(words)
+    style = rng.random()
+    if style < 0.2:
+        text = text.upper()
+    elif style < 0.35:
+        text = text.lower()
+    return text + rng.choice(separators)
+
+
+def make_case(rng):
+    expected = {
+        'code': ''.join(rng.choice(CODE_CHARS) for _ in range(8)),
+        'doctor_name': f"Dr. {rng.choice(FIRST)} {rng.choice(LAST)}",
+        'doctor_id': f"LIC-{rng.randint(10000, 99999)}",
+        'patient_name': f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+        'date': rng.choice(['2025-03-14', '03/14/2025', '14 Mar 2025', '2024-11-02', '11/02/2024']),
+        'medications': rng.sample(DRUGS, rng.randint(1, 4)),
+    }
+    lines = rng.sample(HEADERS, rng.randint(0, 2))
+    field_lines = [
+        label(rng, ['Prescription', 'Code']) + expected['code'],
+        label(rng, ['Doctor', 'Name']) + expected['doctor_name'],
+        label(rng, [rng.choice(['Doctor ID', 'License ID', 'License No'])]) + expected['doctor_id'],
+        label(rng, ['Patient', 'Name']) + expected['patient_name'],
+        label(rng, ['Date']) + expected['date'],
+    ]
+    rng.shuffle(field_lines)
+    lines += field_lines
+    if rng.random() < 0.4:
+        lines.append(label(rng, ['Medications']) + ', '.join(expected['medications']))
+    else:
+        lines.append(rng.choice(['Medications (with Quantity):', 'Medications:', 'MEDICINES', 'Medications']))
+        bullet = rng.choice(['- ', '* ', '• ', '', '{n}. '])
+        for n, drug in enumerate(expected['medications'], start=1):
+            lines.append(bullet.format(n=n) + drug)
+    lines += rng.sample(TRAILERS, rng.randint(0, 2))
+    text = '\n'.join(line if rng.random() < 0.8 else '  ' + line + ' ' for line in lines)
+    return {'text': text, 'expected': expected}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with open(CORPUS, 'w') as f:
+        for _ in range(args.count):
+            f.write(json.dumps(make_case(rng)) + '\n')
+    print(f"wrote {args.count} cases to {CORPUS}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Concurrency stress test for the prescription hash chain.
+
+Hammers add_prescription from many threads, then walks the ledger in
+insertion order and checks every previous_hash points at the row before
+it. With --processes N the threads run in each of N worker processes
+sharing one database, as under a multi-worker server. Exits non-zero if
+the chain forked, rows went missing or an issuer call failed.
+
+    python benchmarks/stress_chain.py --per-thread 500 --threads 1 4 16
+    python benchmarks/stress_chain.py --processes 2 --threads 4 --per-thread 300
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def check_chain(conn):
+    rows = conn.execute("SELECT hash, previous_hash FROM prescriptions ORDER BY rowid").fetchall()
+    prev = ''
+    for i, (row_hash, previous_hash) in enumerate(rows):
+        if previous_hash != prev:
+            return len(rows), f"row {i}: previous_hash {previous_hash[:12]!r} != {prev[:12]!r}"
+        prev = row_hash
+    return len(rows), None
+
+
+def issue_all(app_module, prefix, n_threads, per_thread):
+    """Issue per_thread prescriptions from each of n_threads threads; returns the failed calls."""
+    failures = []
+
+    def issue(t):
+        for i in range(per_thread):
+            try:
+                app_module.add_prescription(f"{prefix}{t:03d}{i:05d}", None, f"Dr {t}", f"D{t}",
+                                            f"Patient {i}", '2025-01-01', ['Drug A 10mg'])
+            except Exception as e:
+                failures.append(repr(e))
+
+    workers = [threading.Thread(target=issue, args=(t,)) for t in range(n_threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return failures
+
+
+def run_worker(args):
+    """Child process: wait for the go file so all processes start together, then issue."""
+    import app as app_module
+
+    go = os.path.join(os.path.dirname(os.environ['DB_FILE']), 'go')
+    print('ready', flush=True)
+    while not os.path.exists(go):
+        time.sleep(0.01)
+    failures = issue_all(app_module, f"P{args.worker}", args.threads[0], args.per_thread)
+    for failure in failures[:3]:
+        print('failure', failure, flush=True)
+    print(f'failed {len(failures)}', flush=True)
+
+
+def run_processes(args, workdir, n_threads):
+    """Issue from --processes child processes at once; returns (elapsed, failed calls)."""
+    go = os.path.join(workdir, 'go')
+    if os.path.exists(go):
+        os.remove(go)
+    env = dict(os.environ, DB_FILE=os.path.join(workdir, 'prescriptions.db'))
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker', str(p),
+                               '--threads', str(n_threads), '--per-thread', str(args.per_thread)],
+                              env=env, stdout=subprocess.PIPE, text=True)
+             for p in range(args.processes)]
+    for proc in procs:
+        proc.stdout.readline()
+    start = time.perf_counter()
+    open(go, 'w').close()
+    failed = 0
+    for proc in procs:
+        for line in proc.stdout:
+            if line.startswith('failure'):
+                print('   ', line.strip())
+            elif line.startswith('failed'):
+                failed += int(line.split()[1])
+        proc.wait()
+    return time.perf_counter() - start, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--per-thread', type=int, default=500)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker is not None:
+        run_worker(args)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='rx-stress-')
+    os.chdir(workdir)
+    # Always the throwaway database, even when DB_FILE is exported
+    os.environ['DB_FILE'] = os.path.join(workdir, 'prescriptions.db')
+
+    import app as app_module
+    import db
+    import ledger
+
+    failed = False
+    for n_threads in args.threads:
+        app_module.reset_db()
+        writer = ledger.get_writer()
+        batches_before = writer.batches
+        if args.processes > 1:
+            elapsed, failed_calls = run_processes(args, workdir, n_threads)
+        else:
+            start = time.perf_counter()
+            failed_calls = len(issue_all(app_module, 'T', n_threads, args.per_thread))
+            elapsed = time.perf_counter() - start
+
+        expected = args.processes * n_threads * args.per_thread
+        count, error = check_chain(db.get_db())
+        if count != expected:
+            error = error or f"expected {expected} rows, found {count}"
+        if failed_calls:
+            error = (error + '; ' if error else '') + f"{failed_calls} add_prescription calls failed"
+        batches = writer.batches - batches_before
+        status = 'OK' if not error else f'BROKEN: {error}'
+        # Batches are only counted in this process, so skip the average for child processes
+        avg_batch = f"{count / max(batches, 1):6.1f}" if args.processes == 1 else '     -'
+        print(f"processes={args.processes} threads={n_threads:3d} rows={count:7d} {expected / elapsed:9.1f} rows/s "
+              f"avg_batch={avg_batch}  {status}")
+        failed = failed or bool(error)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
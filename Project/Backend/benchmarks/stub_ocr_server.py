@@ -0,0 +1,92 @@
+"""Local stand-in for the OCR.Space API, for load tests and offline development.
+
+Accepts the same multipart POST that OCRSpaceBackend sends and answers in
+OCR.Space's JSON shape. The text for an image is looked up by the sha256
+of its bytes in a JSON file ({"<sha256>": "text", ...}); unknown images
+get --default. --latency and --jitter simulate the remote API's response
+time. Point the app at it with OCR_API_URL=http://127.0.0.1:<port>/parse/image.
+
+    python benchmarks/stub_ocr_server.py --port 8765 --texts texts.json --latency 0.5
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def uploaded_file(content_type, body):
+    """Bytes of the first file part in a multipart/form-data body, or None."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+    for part in message.iter_parts():
+        if part.get_filename():
+            return part.get_payload(decode=True)
+    return None
+
+
+def make_server(texts, port=0, latency=0.0, jitter=0.0, default=''):
+    counters = {'requests': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            image = uploaded_file(self.headers.get('Content-Type', ''), body)
+            with lock:
+                counters['requests'] += 1
+            if latency or jitter:
+                time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+            if image is None:
+                result = {'IsErroredOnProcessing': True, 'ErrorMessage': ['no file in request']}
+            else:
+                text = texts.get(hashlib.sha256(image).hexdigest(), default)
+                result = {'IsErroredOnProcessing': False, 'ParsedResults': [{'ParsedText': text}]}
+            payload = json.dumps(result).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.counters = counters
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--texts', help='JSON file mapping image sha256 to OCR text')
+    parser.add_argument('--default', default='')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    args = parser.parse_args()
+
+    texts = {}
+    if args.texts:
+        with open(args.texts) as f:
+            texts = json.load(f)
+    server = make_server(texts, args.port, args.latency, args.jitter, args.default)
+    # loadtest.py reads this line to learn the port when started with --port 0
+    print(f"listening on {server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from flask import g, has_app_context
+from dotenv import load_dotenv
+
+load_dotenv()
+DB_FILE = os.getenv('DB_FILE', 'prescriptions.db')
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+
+# Pragmas applied to every pooled connection. WAL lets readers keep going
+# while a writer commits; NORMAL sync is durable enough under WAL.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA busy_timeout=5000",
+)
+
+# -------------------
+# Hot statements (kept as constants so sqlite3's per-connection
+# statement cache reuses the prepared form on every call)
+# -------------------
+SQL_GET_PRESCRIPTION = "SELECT * FROM prescriptions WHERE code=?"
+SQL_MATCH_FIELDS = "SELECT code FROM prescriptions WHERE doctor_name=? AND patient_name=? AND date=?"
+SQL_GET_USER = "SELECT id, password, role, license_id FROM users WHERE username=?"
+SQL_SET_USER_ROLE = "UPDATE users SET role=? WHERE username=?"
+SQL_INSERT_USER = '''INSERT INTO users (username, password, role, name, license_id, organization)
+                     VALUES (?, ?, ?, ?, ?, ?)'''
+
+
+def connect(path=None):
+    conn = sqlite3.connect(path or DB_FILE, timeout=5.0, check_same_thread=False,
+                           cached_statements=256)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """Fixed-size pool of tuned sqlite3 connections shared across threads."""
+
+    def __init__(self, path=None, size=POOL_SIZE):
+        self.path = path or DB_FILE
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=10.0):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return connect(self.path)
+        return self._idle.get(timeout=timeout)
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._created = 0
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def get_db():
+    """Connection for the current request, or for the current thread outside one."""
+    if has_app_context():
+        if 'db' not in g:
+            g.db = get_pool().acquire()
+        return g.db
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = connect()
+    return conn
+
+
+def close_db(exc=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+def use_database(path):
+    """Point connect(), the pool and this thread's connection at `path`.
+
+    The database is per process; switch it before the app serves requests.
+    """
+    global DB_FILE, _pool
+    with _pool_lock:
+        if path == DB_FILE:
+            return
+        DB_FILE = path
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+def init_app(app):
+    """Use app.config['DB_FILE'] (default: the DB_FILE env var) for this process."""
+    app.config.setdefault('DB_FILE', DB_FILE)
+    use_database(app.config['DB_FILE'])
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import queue
+import threading
+from concurrent.futures import Future
+
+import db
+import merkle
+import search
+
+INSERT_PRESCRIPTION = '''
+    INSERT INTO prescriptions (code, doctor_name, doctor_id, patient_name, date, medications, hash, previous_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SELECT_HEAD = "SELECT hash FROM prescriptions ORDER BY rowid DESC LIMIT 1"
+INSERT_MEDICATION_LINE = "INSERT INTO medication_lines (code, line_no, medication) VALUES (?, ?, ?)"
+
+# The comma-joined medications column stays the hashed, audited form and is
+# what verification and PDFs show. medication_lines holds the same split once
+# for history listings; it is not covered by the hash.
+MEDICATION_SCHEMA = '''CREATE TABLE IF NOT EXISTS medication_lines (
+    code TEXT NOT NULL REFERENCES prescriptions (code),
+    line_no INTEGER NOT NULL,
+    medication TEXT NOT NULL,
+    PRIMARY KEY (code, line_no)
+) WITHOUT ROWID'''
+
+
+def create_tables(conn):
+    conn.execute(MEDICATION_SCHEMA)
+
+
+def medication_lines(code, meds_str):
+    return [(code, line_no, medication) for line_no, medication in enumerate(meds_str.split(','))]
+
+
+def generate_prescription_hash(prescription_data):
+    data_string = json.dumps(prescription_data, sort_keys=True)
+
+    hash_object = hashlib.sha256(data_string.encode())
+    prescription_hash = hash_object.hexdigest()
+
+    return prescription_hash
+
+
+class ChainWriter:
+    """Single writer thread that extends the prescription hash chain.
+
+    Callers submit rows and wait on a Future. The writer drains whatever is
+    queued (up to batch_size) into one transaction, so concurrent issuers
+    share a commit, and keeps the chain head in memory between batches.
+    """
+
+    def __init__(self, path=None, batch_size=64):
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._head = None
+        self._tree_size = None
+        self._data_version = None
+        self.batches = 0
+        self.rows = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='chain-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, row):
+        """Queue (code, doctor_name, doctor_id, patient_name, date, meds_str, hash).
+
+        The Future resolves to the row's hash once committed.
+        """
+        self.start()
+        future = Future()
+        self._pending.put(([row], future, True))
+        return future
+
+    def submit_many(self, rows):
+        """Queue rows to be chained in order, all or nothing.
+
+        The Future resolves to the list of hashes once committed.
+        """
+        self.start()
+        future = Future()
+        self._pending.put((list(rows), future, False))
+        return future
+
+    def head(self):
+        """Hash of the most recently committed prescription ('' for an empty ledger)."""
+        if self._head is not None:
+            return self._head
+        conn = db.get_db()
+        try:
+            result = conn.execute(SELECT_HEAD).fetchone()
+        except Exception as e:
+            print(f"CRITICAL ERROR: An unexpected error occurred: {e}")
+            return ''
+        return result[0] if result else ''
+
+    def forget_head(self):
+        """Drop the cached head, e.g. after the ledger tables were recreated."""
+        self._head = None
+        self._tree_size = None
+
+    def _run(self):
+        conn = db.connect(self.path)
+        conn.isolation_level = None
+        while True:
+            batch = [self._pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(conn, batch)
+            except Exception as e:
+                print(f"CRITICAL ERROR: chain writer batch failed: {e}")
+                self._head = None
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _write_batch(self, conn, batch):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another connection (init_db, a second worker process) may have
+            # written since our last commit; only then re-read the head. We
+            # hold the write lock from here to COMMIT, and a connection's own
+            # commits don't change its data_version, so this value stays
+            # current afterwards. Reading it after COMMIT instead could absorb
+            # another process's write and leave us linking to a stale head.
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._head is None or version != self._data_version:
+                result = conn.execute(SELECT_HEAD).fetchone()
+                self._head = result[0] if result else ''
+                self._tree_size = merkle.tree_size(conn)
+            head = self._head
+            size = self._tree_size
+            written = []
+            for rows, future, single in batch:
+                # Each entry gets a savepoint so a duplicate code only fails its own caller
+                head_before, size_before = head, size
+                conn.execute("SAVEPOINT entry")
+                try:
+                    linked = []
+                    for row in rows:
+                        linked.append(row + (head,))
+                        head = row[6]
+                    conn.executemany(INSERT_PRESCRIPTION, linked)
+                    conn.executemany(INSERT_MEDICATION_LINE,
+                                     [line for row in rows for line in medication_lines(row[0], row[5])])
+                    size = merkle.extend(conn, [(row[0], row[6]) for row in rows], size)
+                    search.index_many(conn, [(row[0], row[1], row[3], row[4]) for row in rows])
+                except Exception as e:
+                    conn.execute("ROLLBACK TO entry")
+                    conn.execute("RELEASE entry")
+                    head, size = head_before, size_before
+                    future.set_exception(e)
+                    continue
+                conn.execute("RELEASE entry")
+                hashes = [row[6] for row in rows]
+                written.append((future, hashes[0] if single else hashes, len(rows)))
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        self._head = head
+        self._tree_size = size
+        self._data_version = version
+        self.batches += 1
+        self.rows += sum(count for _, _, count in written)
+        for future, result, _ in written:
+            future.set_result(result)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ChainWriter()
+    return _writer
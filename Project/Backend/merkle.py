@@ -0,0 +1,131 @@
+import hashlib
+
+# -------------------
+# Incremental Merkle tree over the prescription ledger
+#
+# Level 0 holds one leaf per prescription, in issue order. A node at
+# level l+1 is H(left, right) of its two children, or a copy of the left
+# child when it has no right sibling, so appending a leaf only rewrites
+# the log2(n) nodes on its path to the root.
+# -------------------
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS merkle_leaves (
+        code TEXT PRIMARY KEY,
+        leaf_index INTEGER UNIQUE NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS merkle_nodes (
+        level INTEGER NOT NULL,
+        idx INTEGER NOT NULL,
+        hash TEXT NOT NULL,
+        PRIMARY KEY (level, idx)
+    ) WITHOUT ROWID''',
+)
+
+
+def leaf_hash(prescription_hash):
+    return hashlib.sha256(b'\x00' + bytes.fromhex(prescription_hash)).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def create_tables(conn):
+    for stmt in SCHEMA:
+        conn.execute(stmt)
+
+
+def drop_tables(conn):
+    conn.execute("DROP TABLE IF EXISTS merkle_leaves")
+    conn.execute("DROP TABLE IF EXISTS merkle_nodes")
+
+
+def tree_size(conn):
+    result = conn.execute("SELECT MAX(leaf_index) FROM merkle_leaves").fetchone()
+    return 0 if result[0] is None else result[0] + 1
+
+
+def _get_node(conn, level, idx):
+    result = conn.execute("SELECT hash FROM merkle_nodes WHERE level=? AND idx=?", (level, idx)).fetchone()
+    return result[0] if result else None
+
+
+def _put_node(conn, level, idx, value):
+    conn.execute("INSERT OR REPLACE INTO merkle_nodes (level, idx, hash) VALUES (?, ?, ?)", (level, idx, value))
+
+
+def extend(conn, items, size=None):
+    """Append many leaves at once; items is a list of (code, prescription_hash).
+
+    Each level is recomputed once for the whole range of new leaves instead
+    of walking to the root per leaf. Caller owns the transaction. Returns
+    the new tree size.
+    """
+    if size is None:
+        size = tree_size(conn)
+    if not items:
+        return size
+    first = size
+    size += len(items)
+    conn.executemany("INSERT INTO merkle_leaves (code, leaf_index) VALUES (?, ?)",
+                     [(code, first + i) for i, (code, _) in enumerate(items)])
+
+    nodes = {first + i: leaf_hash(h) for i, (_, h) in enumerate(items)}
+    level, width, lo = 0, size, first
+    while True:
+        conn.executemany("INSERT OR REPLACE INTO merkle_nodes (level, idx, hash) VALUES (?, ?, ?)",
+                         [(level, idx, value) for idx, value in nodes.items()])
+        if width == 1:
+            return size
+        parents = {}
+        for parent in range(lo >> 1, ((width - 1) >> 1) + 1):
+            left, right = 2 * parent, 2 * parent + 1
+            # Only the left sibling of the first new node can predate this call
+            left_hash = nodes[left] if left in nodes else _get_node(conn, level, left)
+            parents[parent] = node_hash(left_hash, nodes[right]) if right < width else left_hash
+        nodes = parents
+        lo >>= 1
+        level += 1
+        width = (width + 1) // 2
+
+
+def root(conn):
+    """(root_hash, size) of the current tree; root is '' for an empty ledger."""
+    size = tree_size(conn)
+    if size == 0:
+        return '', 0
+    level = (size - 1).bit_length()
+    return _get_node(conn, level, 0), size
+
+
+def inclusion_proof(conn, code):
+    """Audit path for a prescription, or None if it is not in the tree.
+
+    The proof is a dict with the leaf index, tree size, root and a list of
+    [side, hash] steps from the leaf upward, where side is 'L' or 'R' for
+    the position of the sibling.
+    """
+    result = conn.execute("SELECT leaf_index FROM merkle_leaves WHERE code=?", (code,)).fetchone()
+    if not result:
+        return None
+    index = result[0]
+    root_hash, size = root(conn)
+    steps = []
+    level, width, i = 0, size, index
+    while width > 1:
+        sibling = i ^ 1
+        if sibling < width:
+            steps.append(['L' if sibling < i else 'R', _get_node(conn, level, sibling)])
+        i >>= 1
+        level += 1
+        width = (width + 1) // 2
+    return {'leaf_index': index, 'tree_size': size, 'root': root_hash, 'path': steps}
+
+
+def verify_proof(prescription_hash, proof):
+    """Check a proof from inclusion_proof against its root in O(log n)."""
+    value = leaf_hash(prescription_hash)
+    for side, sibling in proof['path']:
+        value = node_hash(sibling, value) if side == 'L' else node_hash(value, sibling)
+    return value == proof['root']
@@ -0,0 +1,210 @@
+import bisect
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from flask import Response, abort, before_render_template, g, has_request_context, request, template_rendered
+
+load_dotenv()
+
+# -------------------
+# Per-stage latency histograms, /metrics and Server-Timing
+#
+# Code wraps a hot path in `with metrics.stage('ocr'):`. When metrics are
+# off, stage() hands back one shared no-op object, so the cost is a global
+# lookup and an attribute call. When on, each stage feeds a histogram
+# (exported in Prometheus text format at /metrics). Stages timed on the
+# request thread also go into that response's Server-Timing header.
+# -------------------
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+# Upper bounds in seconds, from a cached SQLite lookup up to a slow OCR call
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+enabled = METRICS_ENABLED
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """(cumulative bucket counts, sum, count)."""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        running, cumulative = 0, []
+        for n in counts:
+            running += n
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+_stages = {}
+_requests = {}
+_counters = []
+_registry_lock = threading.Lock()
+
+
+def _histogram(table, key):
+    hist = table.get(key)
+    if hist is None:
+        with _registry_lock:
+            hist = table.setdefault(key, Histogram())
+    return hist
+
+
+def observe(name, seconds):
+    """Record a stage duration; also adds it to Server-Timing when on a request thread."""
+    _histogram(_stages, name).observe(seconds)
+    if has_request_context():
+        timings = g.get('stage_timings')
+        if timings is None:
+            timings = g.stage_timings = {}
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name):
+    """Context manager timing one stage, or a shared no-op when metrics are off."""
+    return _Stage(name) if enabled else _NO_STAGE
+
+
+def set_enabled(flag):
+    global enabled
+    enabled = bool(flag)
+
+
+def register_counter(name, help_text, read):
+    """Export read() as a Prometheus counter, e.g. a cache's hit total."""
+    with _registry_lock:
+        _counters.append((name, help_text, read))
+
+
+def reset():
+    with _registry_lock:
+        _stages.clear()
+        _requests.clear()
+
+
+# -------------------
+# Prometheus text format
+# -------------------
+def _format_le(bound):
+    return repr(float(bound))
+
+
+def _write_histogram(lines, name, label, table):
+    for key, hist in sorted(table.items()):
+        cumulative, total, count = hist.snapshot()
+        for bound, n in zip(hist.buckets, cumulative):
+            lines.append(f'{name}_bucket{{{label}="{key}",le="{_format_le(bound)}"}} {n}')
+        lines.append(f'{name}_bucket{{{label}="{key}",le="+Inf"}} {cumulative[-1]}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {total:.6f}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {count}')
+
+
+def render_prometheus():
+    lines = ['# HELP rx_stage_seconds Time spent in each verification, issuance and download stage.',
+             '# TYPE rx_stage_seconds histogram']
+    _write_histogram(lines, 'rx_stage_seconds', 'stage', dict(_stages))
+    lines += ['# HELP rx_request_seconds Request latency by Flask endpoint.',
+              '# TYPE rx_request_seconds histogram']
+    _write_histogram(lines, 'rx_request_seconds', 'endpoint', dict(_requests))
+    for name, help_text, read in list(_counters):
+        try:
+            value = read()
+        except Exception as e:
+            print("Metrics counter failed:", name, e)
+            continue
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter', f'{name} {value}']
+    return '\n'.join(lines) + '\n'
+
+
+def server_timing_header(timings, total=None):
+    parts = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items()]
+    if total is not None:
+        parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+# -------------------
+# Flask wiring
+# -------------------
+def _start_request():
+    if enabled:
+        g.request_start = time.perf_counter()
+
+
+def _finish_request(response):
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    total = time.perf_counter() - start
+    _histogram(_requests, request.endpoint or 'unmatched').observe(total)
+    response.headers['Server-Timing'] = server_timing_header(g.get('stage_timings') or {}, total)
+    return response
+
+
+def _template_started(sender, template, context, **extra):
+    if enabled and has_request_context():
+        g.template_start = time.perf_counter()
+
+
+def _template_done(sender, template, context, **extra):
+    if has_request_context():
+        start = g.pop('template_start', None)
+        if start is not None:
+            observe('template', time.perf_counter() - start)
+
+
+def metrics_view():
+    if not enabled:
+        abort(404)
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_done, app)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,123 @@
+import db
+import history
+import ledger
+import merkle
+import search
+
+# -------------------
+# Versioned schema migrations
+#
+# The schema version lives in SQLite's PRAGMA user_version. migrate() applies
+# every migration above it in one BEGIN IMMEDIATE transaction, so workers
+# starting together serialise on the write lock and the later ones find
+# nothing left to do. Steps use IF NOT EXISTS so a database created by the
+# old drop-and-recreate init_db is adopted as it stands. Add new steps to
+# the end of MIGRATIONS; never edit one that has shipped.
+# -------------------
+
+
+def _base_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prescriptions (
+            code TEXT PRIMARY KEY,
+            doctor_name TEXT,
+            doctor_id TEXT,
+            patient_name TEXT,
+            date TEXT,
+            medications TEXT,
+            hash TEXT,
+            previous_hash TEXT
+        )
+    ''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE,
+        password TEXT,
+        role TEXT,
+        name TEXT,
+        license_id TEXT,
+        organization TEXT
+    )''')
+
+
+def _merkle_tree(conn):
+    merkle.create_tables(conn)
+    # Ledgers issued before the tree existed get their leaves in issue order
+    if merkle.tree_size(conn) == 0:
+        rows = conn.execute("SELECT code, hash FROM prescriptions ORDER BY rowid").fetchall()
+        merkle.extend(conn, rows, 0)
+
+
+def _search_index(conn):
+    search.create_tables(conn)
+    if conn.execute("SELECT 1 FROM prescription_search LIMIT 1").fetchone() is None:
+        rows = conn.execute("SELECT code, doctor_name, patient_name, date FROM prescriptions").fetchall()
+        search.index_many(conn, rows)
+
+
+def _medication_lines(conn):
+    ledger.create_tables(conn)
+    # Split exactly as the hashed column was always read, so lines and audit agree
+    rows = conn.execute("SELECT code, medications FROM prescriptions WHERE medications IS NOT NULL").fetchall()
+    conn.executemany(ledger.INSERT_MEDICATION_LINE,
+                     [line for code, meds in rows for line in ledger.medication_lines(code, meds)])
+
+
+def _history_indexes(conn):
+    history.create_tables(conn)
+
+
+MIGRATIONS = (
+    (1, 'prescriptions and users', _base_tables),
+    (2, 'merkle tree', _merkle_tree),
+    (3, 'search index', _search_index),
+    (4, 'medication lines', _medication_lines),
+    (5, 'history indexes', _history_indexes),
+)
+LATEST = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(path=None):
+    """Bring the database up to LATEST. Returns the names of the steps applied."""
+    conn = db.connect(path)
+    try:
+        # Fast path for every start after the first: one pragma read, no lock
+        if schema_version(conn) >= LATEST:
+            return []
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = schema_version(conn)
+            applied = []
+            for number, name, step in MIGRATIONS:
+                if number > version:
+                    step(conn)
+                    applied.append(name)
+            conn.execute(f"PRAGMA user_version = {LATEST}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return applied
+    finally:
+        conn.close()
+
+
+def reset(path=None):
+    """Drop the ledger and everything derived from it, then migrate. Users are kept."""
+    conn = db.connect(path)
+    try:
+        conn.execute("DROP TABLE IF EXISTS medication_lines")
+        conn.execute("DROP TABLE IF EXISTS prescriptions")
+        conn.execute("DROP TABLE IF EXISTS audit_checkpoints")
+        merkle.drop_tables(conn)
+        search.drop_tables(conn)
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+    finally:
+        conn.close()
+    return migrate(path)
@@ -0,0 +1,242 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+# -------------------
+# OCR backends
+# -------------------
+OCR_BACKEND = os.getenv('OCR_BACKEND', 'ocrspace')
+OCR_API_URL = os.getenv('OCR_API_URL', 'https://api.ocr.space/parse/image')
+OCR_TIMEOUT = float(os.getenv('OCR_TIMEOUT', '10'))
+OCR_MAX_CONCURRENCY = int(os.getenv('OCR_MAX_CONCURRENCY', '4'))
+# Background requests allowed to wait for a slot; past this submit() sheds load
+OCR_MAX_QUEUE = int(os.getenv('OCR_MAX_QUEUE', '16'))
+OCR_CACHE_SIZE = int(os.getenv('OCR_CACHE_SIZE', '256'))
+OCR_CACHE_TTL = float(os.getenv('OCR_CACHE_TTL', '3600'))
+
+
+class OCRBackend:
+    """Turns image bytes into text. Backends raise on failure."""
+
+    name = 'base'
+
+    def extract_text(self, image_bytes, timeout):
+        raise NotImplementedError
+
+
+class OCRSpaceBackend(OCRBackend):
+    """OCR.Space HTTP API over a pooled keep-alive session."""
+
+    name = 'ocrspace'
+
+    def __init__(self, api_key, url=OCR_API_URL, pool_size=OCR_MAX_CONCURRENCY):
+        self.api_key = api_key
+        self.url = url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def extract_text(self, image_bytes, timeout):
+        response = self.session.post(
+            self.url,
+            files={"filename": ("image.png", image_bytes)},
+            data={"apikey": self.api_key, "language": "eng"},
+            timeout=(min(3.0, timeout), timeout)
+        )
+        result = response.json()
+        parsed_results = result.get("ParsedResults")
+        if not parsed_results:
+            raise RuntimeError(result.get("ErrorMessage") or "OCR returned no results")
+        return parsed_results[0].get("ParsedText", "")
+
+
+class StubBackend(OCRBackend):
+    """Canned text for tests: looked up by sha256 of the image, else `default`."""
+
+    name = 'stub'
+
+    def __init__(self, texts=None, default=''):
+        self.texts = texts or {}
+        self.default = default
+        self.calls = 0
+
+    def extract_text(self, image_bytes, timeout):
+        self.calls += 1
+        return self.texts.get(hashlib.sha256(image_bytes).hexdigest(), self.default)
+
+
+class TesseractBackend(OCRBackend):
+    """Local Tesseract engine via pytesseract (optional dependency)."""
+
+    name = 'tesseract'
+
+    def __init__(self):
+        try:
+            import pytesseract
+        except ImportError:
+            raise RuntimeError("OCR_BACKEND=tesseract needs the pytesseract package")
+        self._pytesseract = pytesseract
+
+    def extract_text(self, image_bytes, timeout):
+        from PIL import Image
+        return self._pytesseract.image_to_string(Image.open(BytesIO(image_bytes)), timeout=timeout)
+
+
+# -------------------
+# Content-hash keyed LRU cache with TTL
+# -------------------
+class TTLCache:
+    def __init__(self, maxsize=OCR_CACHE_SIZE, ttl=OCR_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class OCRService:
+    """Front for a backend: cache lookup, bounded concurrency and a deadline."""
+
+    def __init__(self, backend, max_concurrency=OCR_MAX_CONCURRENCY, timeout=OCR_TIMEOUT, cache=None,
+                 max_queue=OCR_MAX_QUEUE):
+        self.backend = backend
+        self.timeout = timeout
+        self.cache = cache if cache is not None else TTLCache()
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='ocr')
+        self._max_pending = max_concurrency + max_queue
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self.shed = 0
+
+    def extract_text(self, image_bytes, deadline=None):
+        """OCR text for an image, or None if OCR failed or ran out of time.
+
+        deadline is a time.monotonic() value; by default it is timeout from now.
+        """
+        key = hashlib.sha256(image_bytes).hexdigest()
+        text = self.cache.get(key)
+        if text is not None:
+            return text
+
+        if deadline is None:
+            deadline = time.monotonic() + self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not self._slots.acquire(timeout=remaining):
+            print("OCR request failed: no free OCR slot before the deadline")
+            return None
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print("OCR request failed: deadline passed while waiting for a slot")
+                return None
+            with metrics.stage('ocr_backend'):
+                text = self.backend.extract_text(image_bytes, remaining)
+        except Exception as e:
+            print("OCR request failed:", e)
+            return None
+        finally:
+            self._slots.release()
+
+        self.cache.put(key, text)
+        return text
+
+    def submit(self, image_bytes):
+        """Start extract_text in the background and return its Future.
+
+        The deadline starts now, not when a worker picks the task up, and is
+        kept on the Future for wait(). With max_queue requests already
+        waiting the Future resolves to None straight away.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._pending_lock:
+            if self._pending >= self._max_pending:
+                self.shed += 1
+                print("OCR request failed: OCR queue is full")
+                future = Future()
+                future.set_result(None)
+                future.deadline = deadline
+                return future
+            self._pending += 1
+        future = self._executor.submit(self.extract_text, image_bytes, deadline)
+        future.deadline = deadline
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _task_done(self, future):
+        with self._pending_lock:
+            self._pending -= 1
+
+    def wait(self, future):
+        """Result of a submit() Future, or None once its deadline has passed."""
+        try:
+            return future.result(timeout=max(0.0, future.deadline - time.monotonic()))
+        except TimeoutError:
+            print("OCR request failed: deadline passed")
+            return None
+
+
+def make_backend(name=OCR_BACKEND):
+    if name == 'stub':
+        return StubBackend(default=os.getenv('OCR_STUB_TEXT', ''))
+    if name == 'tesseract':
+        return TesseractBackend()
+    return OCRSpaceBackend(os.getenv('OCR_API_KEY'))
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_ocr():
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = OCRService(make_backend())
+    return _service
+
+
+def set_backend(backend):
+    """Swap the backend (tests, benchmarks); also drops cached text."""
+    service = get_ocr()
+    service.backend = backend
+    service.cache.clear()
@@ -0,0 +1,144 @@
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# -------------------
+# Rendered prescription PDFs, keyed by the row's stored hash
+#
+# A prescription's fields never change after issue, so its hash names the
+# rendered bytes. The memory tier is an LRU bounded by total bytes; the
+# optional disk tier (PDF_CACHE_DIR) survives restarts and is shared by
+# workers on the same host. Every PDF_CACHE_DIR_SWEEP writes a worker trims
+# the directory to PDF_CACHE_DIR_MAX_BYTES, oldest mtime first (disk hits
+# touch the file, so that is least recently used).
+# -------------------
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', '')
+PDF_CACHE_DIR_MAX_BYTES = int(os.getenv('PDF_CACHE_DIR_MAX_BYTES', str(1024 * 1024 * 1024)))
+PDF_CACHE_DIR_SWEEP = int(os.getenv('PDF_CACHE_DIR_SWEEP', '64'))
+PDF_PRERENDER = os.getenv('PDF_PRERENDER', '').lower() in ('1', 'true', 'yes')
+
+
+class PDFCache:
+    def __init__(self, max_bytes=PDF_CACHE_MAX_BYTES, directory=PDF_CACHE_DIR, dir_max_bytes=PDF_CACHE_DIR_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.dir_max_bytes = dir_max_bytes
+        self._writes = 0
+        self.disk_evictions = 0
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key):
+        """(pdf_bytes, rendered_at) or None."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item
+        if self.directory:
+            try:
+                path = self._path(key)
+                with open(path, 'rb') as f:
+                    pdf_bytes = f.read()
+                item = (pdf_bytes, os.path.getmtime(path))
+                os.utime(path)
+            except OSError:
+                item = None
+            if item is not None:
+                self.disk_hits += 1
+                self._remember(key, item)
+                return item
+        self.misses += 1
+        return None
+
+    def put(self, key, pdf_bytes):
+        item = (pdf_bytes, time.time())
+        if self.directory:
+            try:
+                fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(pdf_bytes)
+                os.replace(tmp, self._path(key))
+            except OSError as e:
+                print("PDF cache write failed:", e)
+            with self._lock:
+                self._writes += 1
+                sweep = self._writes % PDF_CACHE_DIR_SWEEP == 0
+            if sweep:
+                self.trim_directory()
+        self._remember(key, item)
+        return item
+
+    def trim_directory(self):
+        """Delete the least recently used PDFs until the directory fits dir_max_bytes."""
+        files = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.pdf'):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            print("PDF cache sweep failed:", e)
+            return
+        total = sum(size for _, size, _ in files)
+        files.sort()
+        for _, size, path in files:
+            if total <= self.dir_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Another worker got there first
+                pass
+            total -= size
+            self.disk_evictions += 1
+
+    def _remember(self, key, item):
+        size = len(item[0])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._items[key] = item
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted[0])
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PDFCache()
+    return _cache
@@ -0,0 +1,73 @@
+import os
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+
+# -------------------
+# Budgeted, early-exit text extraction for uploaded PDFs
+# -------------------
+PDF_MAX_BYTES = int(os.getenv('PDF_MAX_BYTES', str(10 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '5'))
+PDF_MAX_TEXT = int(os.getenv('PDF_MAX_TEXT', '200000'))
+
+# render_prescription_pdf stamps the code into the document subject
+SUBJECT_PREFIX = 'rx-code:'
+
+
+def open_pdf(file_bytes):
+    if len(file_bytes) > PDF_MAX_BYTES:
+        raise ValueError(f"PDF is larger than {PDF_MAX_BYTES} bytes")
+    return PdfReader(BytesIO(file_bytes), strict=False)
+
+
+def embedded_code(reader):
+    """Code from the metadata of a PDF we generated, else None."""
+    try:
+        subject = (reader.metadata or {}).get('/Subject') or ''
+    except Exception:
+        return None
+    if subject.startswith(SUBJECT_PREFIX):
+        return subject[len(SUBJECT_PREFIX):].strip() or None
+    return None
+
+
+def iter_page_text(reader, max_pages=PDF_MAX_PAGES, max_text=PDF_MAX_TEXT):
+    """Yield page text one page at a time, within the page and text budgets."""
+    total = 0
+    for number, page in enumerate(reader.pages):
+        if number >= max_pages:
+            return
+        text = page.extract_text() or ''
+        total += len(text)
+        if total > max_text:
+            yield text[:max(0, len(text) - (total - max_text))]
+            return
+        yield text
+
+
+def enough_fields(parsed):
+    return bool(parsed and (parsed.get('code') or
+                            (parsed.get('doctor_name') and parsed.get('patient_name') and parsed.get('date'))))
+
+
+def parse_pdf(file_bytes, parser):
+    """Parse an uploaded PDF, stopping once a code or the key fields turn up.
+
+    `parser` is fed one page at a time (feed(text), result()), so each page
+    is parsed once and a list running onto the next page carries over. Our
+    own PDFs carry their code in the metadata, so only the first page is
+    read (for the fields verify() cross-checks against the ledger).
+    """
+    reader = open_pdf(file_bytes)
+    code = embedded_code(reader)
+    parsed = None
+    for page_text in iter_page_text(reader):
+        parser.feed(page_text + '\n')
+        parsed = parser.result()
+        if code or enough_fields(parsed):
+            break
+    if code:
+        parsed = parsed or {'code': None, 'doctor_name': None, 'doctor_id': None,
+                            'patient_name': None, 'date': None, 'medications': []}
+        parsed['code'] = code
+    return parsed
@@ -0,0 +1,138 @@
+import re
+from collections import deque
+
+# -------------------
+# Single-pass parser for OCR / PDF prescription text
+#
+# One compiled pattern recognises every field label at the start of a line
+# ("Doctor Name:", "patient - ", "Medications (with Quantity):", ...), so each
+# line is matched once. Lines after a medications label, up to the next
+# label, are medication entries.
+#
+# OCR of a photo often joins a label onto the text before it ("CITY CLINIC
+# Prescription Code: ...") or puts two columns on one line ("Patient Name:
+# ... Date: ..."). A label that is not at the start of a line counts only
+# when a colon follows it, and a value is cut where the next such label begins.
+# -------------------
+
+FIELDS = ('code', 'doctor_name', 'doctor_id', 'patient_name', 'date', 'medications')
+
+_LABELS = r'''(?:
+        (?P<code>(?:prescription\s*|rx\s*)?code\b)
+      | (?P<doctor_name>(?:doctor\s*name|dr\.?\s*name|physician(?:\s*name)?|prescriber)\b)
+      | (?P<doctor_id>(?:doctor\s*id|licen[cs]e(?:\s*(?:id|no|number))?)\b\.?)
+      | (?P<patient_name>patient(?:\s*name)?\b)
+      | (?P<date>(?:date\s*issued|(?:issue\s*)?date(?:\s*of\s*issue)?)\b)
+      | (?P<medications>(?:medications?|medicines?)\b(?:\s*\([^)]*\))?)
+      | (?P<stop>(?:ledger\s*(?:proof|entry)|signature|notes?|refills?)\b)
+    )'''
+_LABEL_RE = re.compile(r'^\s*' + _LABELS + r'\s*(?P<sep>[:#=\-])?\s*(?P<value>.*?)\s*$',
+                       re.IGNORECASE | re.VERBOSE)
+# The same labels after other text on the line; a colon is required there
+_INLINE_LABEL_RE = re.compile(r'(?<!\S)' + _LABELS + r'\s*(?P<sep>:)', re.IGNORECASE | re.VERBOSE)
+# Column separators OCR leaves around a value cut short by the next label
+_VALUE_TRIM = ' \t|;,'
+
+_BULLET_RE = re.compile(r'^\s*(?:[-*•·>]+|\d+[.)])\s*')
+_CODE_RE = re.compile(r'^[A-Z0-9]{8}$')
+_DATE_RE = re.compile(r'^(?:\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}'
+                      r'|\d{1,2}\s+[A-Za-z]{3,9}\.?\s+\d{4}|[A-Za-z]{3,9}\.?\s+\d{1,2},?\s+\d{4})$')
+_NAME_RE = re.compile(r"^[A-Za-z][A-Za-z .,'\-]*$")
+
+
+def _value_confidence(field, value):
+    if field == 'code':
+        return 1.0 if _CODE_RE.match(value) else (0.6 if value.isalnum() else 0.3)
+    if field == 'date':
+        return 1.0 if _DATE_RE.match(value) else 0.5
+    if field in ('doctor_name', 'patient_name'):
+        return 1.0 if _NAME_RE.match(value) else 0.6
+    if field == 'doctor_id':
+        return 1.0 if any(ch.isdigit() for ch in value) else 0.7
+    return 1.0
+
+
+def _split_medications(value):
+    return [m.strip() for m in value.split(',') if m.strip()]
+
+
+class PrescriptionParser:
+    """Incremental form of parse_prescription_text: feed() text in pieces
+    (e.g. one PDF page at a time) and read result() whenever needed. The
+    outcome is the same as parsing the concatenated text in one go.
+    """
+
+    def __init__(self):
+        self.data = {'code': None, 'doctor_name': None, 'doctor_id': None,
+                     'patient_name': None, 'date': None, 'medications': []}
+        self.confidence = {}
+        self.in_medications = False
+
+    def feed(self, text):
+        data, confidence = self.data, self.confidence
+        # A deque so the rest of a split line can go back on the front cheaply
+        lines = deque(text.splitlines())
+        while lines:
+            line = lines.popleft().strip()
+            if not line:
+                continue
+            match = _LABEL_RE.match(line)
+            field = None
+            if match:
+                field = next(f for f in FIELDS + ('stop',) if match.group(f))
+                # A bare one-word label with no separator ("Patient to take twice
+                # daily") is prose, unless it stands alone as a heading
+                if (not match.group('sep') and match.group('value') and field not in ('code', 'date', 'stop')
+                        and ' ' not in match.group(field).strip()):
+                    field = None
+            if not field:
+                inline = ':' in line and not self.in_medications and _INLINE_LABEL_RE.search(line)
+                if inline:
+                    # Drop the text before the label and parse the rest as a line
+                    lines.appendleft(line[inline.start():])
+                    continue
+                if self.in_medications:
+                    med = _BULLET_RE.sub('', line)
+                    if med:
+                        data['medications'].append(med)
+                        confidence['medications'] = 0.8
+                continue
+
+            self.in_medications = False
+            if field == 'stop':
+                continue
+            value = match.group('value')
+            label_confidence = 1.0 if match.group('sep') else 0.7
+            following = ':' in value and _INLINE_LABEL_RE.search(value)
+            if following:
+                # A second column on the same line: parse it next
+                lines.appendleft(value[following.start():])
+                value = value[:following.start()].strip(_VALUE_TRIM)
+            if field == 'medications':
+                if value:
+                    data['medications'] = _split_medications(value)
+                    confidence['medications'] = label_confidence
+                else:
+                    data['medications'] = []
+                    self.in_medications = True
+                continue
+            if value:
+                data[field] = value
+                confidence[field] = round(label_confidence * _value_confidence(field, value), 2)
+
+    def result(self):
+        """The fields so far (missing fields are None, medications a list) plus 'confidence'."""
+        return dict(self.data, medications=list(self.data['medications']), confidence=dict(self.confidence))
+
+
+def parse_prescription_text(text):
+    """Parse labelled prescription text into fields.
+
+    Returns the fields dict (missing fields are None, medications a list)
+    plus 'confidence', a 0..1 score per field found.
+    """
+    if not text:
+        return None
+    parser = PrescriptionParser()
+    parser.feed(text)
+    return parser.result()
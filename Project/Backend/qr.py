@@ -0,0 +1,41 @@
+from PIL import Image
+from pyzbar.pyzbar import decode
+
+import metrics
+
+# -------------------
+# Staged QR decoding, cheapest pass first
+# -------------------
+FAST_MAX_SIDE = 800
+
+# Crop boxes as fractions of (width, height). Our own PDFs put the QR code
+# in the top-right corner, so that region goes first.
+CROPS = (
+    (0.5, 0.0, 1.0, 0.5),
+    (0.0, 0.0, 0.5, 0.5),
+    (0.5, 0.5, 1.0, 1.0),
+    (0.0, 0.5, 0.5, 1.0),
+    (0.25, 0.25, 0.75, 0.75),
+)
+
+
+def decode_codes(img):
+    with metrics.stage('pyzbar'):
+        return [symbol.data.decode('utf-8', 'replace') for symbol in decode(img)]
+
+
+def qr_passes(img):
+    """Yield (stage, codes) for a downscaled grayscale pass, full resolution, then crops.
+
+    Callers stop iterating as soon as a pass gives them what they need.
+    """
+    gray = img.convert('L')
+    width, height = gray.size
+    scale = FAST_MAX_SIDE / max(width, height)
+    if scale < 1:
+        small = gray.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.BILINEAR)
+        yield 'fast', decode_codes(small)
+    yield 'full', decode_codes(gray)
+    for left, top, right, bottom in CROPS:
+        box = (int(left * width), int(top * height), int(right * width), int(bottom * height))
+        yield 'crop', decode_codes(gray.crop(box))
@@ -0,0 +1,134 @@
+import re
+from itertools import combinations
+import unicodedata
+from difflib import SequenceMatcher
+
+# -------------------
+# Fuzzy lookup of prescriptions from OCR-parsed fields
+#
+# prescription_search is an FTS5 trigram index over normalized doctor name,
+# patient name and date. A query picks the rarest trigrams of the parsed
+# fields and matches rows containing any two of them, so common trigrams
+# like "dr " never drag in half the ledger and a few misread characters
+# still leave enough pairs intact. The best bm25 candidates are then
+# re-ranked by string similarity.
+#
+# A match must name the patient and one more field, each close to the
+# stored value on its own; otherwise a lone doctor name would match every
+# one of that doctor's prescriptions, and "Pat 9" would pass for "Pat 2".
+# -------------------
+
+FIELDS = ('doctor_name', 'patient_name', 'date')
+MAX_QUERY_TRIGRAMS = 8
+CANDIDATES = 20
+# Mean similarity over all three fields, a missing one counting as 0: two
+# exact fields score 0.67, so this admits patient plus one other field
+MIN_SCORE = 0.6
+# Each field that was read must be at least this close. A couple of OCR
+# slips in a name stay above 0.85; a date one digit off is another day
+MIN_FIELD_SCORE = {'doctor_name': 0.85, 'patient_name': 0.85, 'date': 0.95}
+
+SCHEMA = (
+    "CREATE INDEX IF NOT EXISTS idx_prescriptions_match ON prescriptions (doctor_name, patient_name, date)",
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS prescription_search USING fts5(
+        code UNINDEXED, doctor_name, patient_name, date, tokenize='trigram'
+    )''',
+    "CREATE VIRTUAL TABLE IF NOT EXISTS prescription_search_vocab USING fts5vocab(prescription_search, 'row')",
+)
+
+_non_alnum = re.compile(r'[^0-9a-z]+')
+
+# Document frequency per trigram, only used to pick rare query terms, so a
+# slightly stale value is harmless. Bounded by the normalized alphabet.
+_doc_freq = {}
+
+
+def normalize(value):
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode('ascii')
+    return _non_alnum.sub(' ', value.lower()).strip()
+
+
+def trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def create_tables(conn):
+    for stmt in SCHEMA:
+        conn.execute(stmt)
+
+
+def drop_tables(conn):
+    _doc_freq.clear()
+    conn.execute("DROP TABLE IF EXISTS prescription_search_vocab")
+    conn.execute("DROP TABLE IF EXISTS prescription_search")
+
+
+def index_prescription(conn, code, doctor_name, patient_name, date):
+    """Add a prescription to the search index. Caller owns the transaction."""
+    conn.execute("INSERT INTO prescription_search (code, doctor_name, patient_name, date) VALUES (?, ?, ?, ?)",
+                 (code, normalize(doctor_name), normalize(patient_name), normalize(date)))
+
+
+def index_many(conn, rows):
+    """Bulk form of index_prescription; rows are (code, doctor_name, patient_name, date)."""
+    conn.executemany("INSERT INTO prescription_search (code, doctor_name, patient_name, date) VALUES (?, ?, ?, ?)",
+                     [(code, normalize(d), normalize(p), normalize(dt)) for code, d, p, dt in rows])
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _rarest(conn, terms, limit):
+    """The `limit` rarest (field, trigram) terms that occur in the index at all."""
+    doc_counts = {}
+    for field, gram in terms:
+        count = _doc_freq.get(gram)
+        if count is None:
+            result = conn.execute("SELECT doc FROM prescription_search_vocab WHERE term=?", (gram,)).fetchone()
+            # A trigram nothing contains (usually an OCR misread) can't match
+            # anything; don't cache that, a later prescription may add it
+            if not result:
+                continue
+            count = _doc_freq[gram] = result[0]
+        doc_counts[(field, gram)] = count
+    return sorted(doc_counts, key=doc_counts.get)[:limit]
+
+
+def find_candidates(conn, parsed, limit=5, min_score=MIN_SCORE):
+    """Rank stored prescriptions against parsed OCR fields.
+
+    Returns up to `limit` (score, code) pairs, best first, with score the
+    mean similarity over all of FIELDS. Needs the patient name and at least
+    one other field.
+    """
+    query = {f: normalize(parsed.get(f)) for f in FIELDS if normalize(parsed.get(f))}
+    if 'patient_name' not in query or len(query) < 2:
+        return []
+
+    terms = {(field, gram) for field, value in query.items() for gram in trigrams(value)}
+    rare = [f'{field} : "{gram}"' for field, gram in _rarest(conn, terms, MAX_QUERY_TRIGRAMS)]
+    if len(rare) < 2:
+        return []
+    match = ' OR '.join(f'({a} AND {b})' for a, b in combinations(rare, 2))
+
+    rows = conn.execute(
+        "SELECT code, doctor_name, patient_name, date FROM prescription_search "
+        "WHERE prescription_search MATCH ? ORDER BY rank LIMIT ?",
+        (match, CANDIDATES)).fetchall()
+
+    ranked = []
+    for code, doctor_name, patient_name, date in rows:
+        stored = {'doctor_name': doctor_name, 'patient_name': patient_name, 'date': date}
+        scores = {f: similarity(value, stored[f]) for f, value in query.items()}
+        if any(scores[f] < MIN_FIELD_SCORE[f] for f in scores):
+            continue
+        score = sum(scores.values()) / len(FIELDS)
+        if score >= min_score:
+            ranked.append((score, code))
+    ranked.sort(reverse=True)
+    return ranked[:limit]
@@ -0,0 +1,233 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+import db
+import merkle
+
+load_dotenv()
+
+# -------------------
+# Verification cache: positive LRU plus a Bloom filter of issued codes
+#
+# Ledger rows never change once written, so a looked-up row can be cached
+# for as long as the ledger exists. Inclusion proofs do change: every append,
+# by this or any other process, grows the tree, so a cached proof is reused
+# only while its tree_size is still the ledger's (one indexed MAX lookup).
+# A code the filter has never seen was never issued, and get_prescription
+# returns None for it without a query.
+#
+# The filter is built on a background thread (create_app starts it); until
+# it is ready every lookup goes to SQLite. This process adds its own issued
+# codes straight away. Codes issued by other processes are picked up by
+# rowid: a filter miss older than VERIFY_FILTER_SYNC seconds syncs before
+# it is trusted.
+# -------------------
+VERIFY_CACHE_SIZE = int(os.getenv('VERIFY_CACHE_SIZE', '10000'))
+VERIFY_FILTER_FP_RATE = float(os.getenv('VERIFY_FILTER_FP_RATE', '0.001'))
+VERIFY_FILTER_SYNC = float(os.getenv('VERIFY_FILTER_SYNC', '1.0'))
+VERIFY_FILTER_MIN_CAPACITY = 100000
+
+SELECT_CODES_AFTER = "SELECT rowid, code FROM prescriptions WHERE rowid > ? ORDER BY rowid"
+SELECT_MAX_ROWID = "SELECT MAX(rowid) FROM prescriptions"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing."""
+
+    def __init__(self, capacity, fp_rate=VERIFY_FILTER_FP_RATE):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        for pos in self._positions(item):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class VerificationCache:
+    def __init__(self, size=VERIFY_CACHE_SIZE, fp_rate=VERIFY_FILTER_FP_RATE, sync_interval=VERIFY_FILTER_SYNC):
+        self.maxsize = size
+        self.fp_rate = fp_rate
+        self.sync_interval = sync_interval
+        self._rows = OrderedDict()
+        self._proofs = OrderedDict()
+        self._lock = threading.RLock()
+        self._filter = None
+        self._builder = None
+        self._epoch = 0
+        self._last_rowid = 0
+        self._synced_at = 0.0
+        self.hits = 0
+        self.filter_rejects = 0
+        self.misses = 0
+        self.false_positives = 0
+
+    # -- filter --
+    def rebuild(self, conn):
+        """Load every issued code into a fresh filter sized for the ledger.
+
+        The scan runs without the lock; lookups keep using the old filter
+        (or SQLite) until the new one is swapped in.
+        """
+        epoch = self._epoch
+        # Size from the highest rowid (>= the row count: the ledger is append
+        # only) and stream the codes off the cursor rather than fetchall()
+        issued = conn.execute(SELECT_MAX_ROWID).fetchone()[0] or 0
+        bloom = BloomFilter(max(VERIFY_FILTER_MIN_CAPACITY, 2 * issued), self.fp_rate)
+        last_rowid = 0
+        for last_rowid, code in conn.execute(SELECT_CODES_AFTER, (0,)):
+            bloom.add(code)
+        with self._lock:
+            if epoch != self._epoch:
+                # reset() ran meanwhile; this scan may predate it
+                return
+            self._filter = bloom
+            self._last_rowid = last_rowid
+            # Catch up on codes committed during the scan
+            self._sync_locked(conn)
+
+    def start_rebuild(self, path=None):
+        """Build the filter on a background thread with its own connection."""
+        with self._lock:
+            # A builder started before a fork (gunicorn --preload) is not alive in the child
+            if self._builder is not None and self._builder.is_alive():
+                return
+            self._builder = threading.Thread(target=self._build, args=(path,), name='verify-filter', daemon=True)
+            self._builder.start()
+
+    def _build(self, path):
+        try:
+            conn = db.connect(path)
+            try:
+                self.rebuild(conn)
+            finally:
+                conn.close()
+        except Exception as e:
+            print("Verification filter build failed:", e)
+
+    def sync(self, conn):
+        """Add codes written since the last sync, by this or any other process."""
+        with self._lock:
+            if self._filter is None:
+                return
+            self._sync_locked(conn)
+            if self._filter.count > self._filter.capacity:
+                # Past capacity the false-positive rate climbs; resize in the background
+                self.start_rebuild()
+
+    def _sync_locked(self, conn):
+        rows = conn.execute(SELECT_CODES_AFTER, (self._last_rowid,)).fetchall()
+        for _, code in rows:
+            self._filter.add(code)
+        if rows:
+            self._last_rowid = rows[-1][0]
+        self._synced_at = time.monotonic()
+
+    def add_codes(self, codes):
+        """Record codes this process just issued."""
+        with self._lock:
+            if self._filter is not None:
+                for code in codes:
+                    self._filter.add(code)
+
+    def might_exist(self, code, get_conn):
+        bloom = self._filter
+        if bloom is None:
+            # Not built yet (or reset): answer from SQLite meanwhile
+            self.start_rebuild()
+            return True
+        if code in bloom:
+            return True
+        if time.monotonic() - self._synced_at < self.sync_interval:
+            return False
+        self.sync(get_conn())
+        return code in self._filter
+
+    # -- rows and proofs --
+    def get_row(self, code, get_conn, load):
+        """Ledger row for code via the LRU and filter, calling load(code) on a miss."""
+        with self._lock:
+            row = self._rows.get(code)
+            if row is not None:
+                self._rows.move_to_end(code)
+                self.hits += 1
+                return row
+        if not self.might_exist(code, get_conn):
+            self.filter_rejects += 1
+            return None
+        self.misses += 1
+        row = load(code)
+        if row is None:
+            self.false_positives += 1
+            return None
+        with self._lock:
+            self._remember(self._rows, code, row)
+        return row
+
+    def get_proof(self, code, get_conn, load):
+        """Inclusion proof for code, reused until the ledger grows."""
+        size = merkle.tree_size(get_conn())
+        with self._lock:
+            proof = self._proofs.get(code)
+            if proof is not None and proof['tree_size'] == size:
+                self._proofs.move_to_end(code)
+                return proof
+        proof = load(code)
+        if proof is not None:
+            with self._lock:
+                self._remember(self._proofs, code, proof)
+        return proof
+
+    def _remember(self, table, key, value):
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > self.maxsize:
+            table.popitem(last=False)
+
+    def reset(self):
+        """Forget everything, e.g. after the ledger tables are recreated."""
+        with self._lock:
+            self._rows.clear()
+            self._proofs.clear()
+            self._filter = None
+            self._last_rowid = 0
+            self._epoch += 1
+
+    def hit_rate(self):
+        lookups = self.hits + self.filter_rejects + self.misses
+        return (self.hits + self.filter_rejects) / lookups if lookups else 0.0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VerificationCache()
+    return _cache